@@ -0,0 +1,75 @@
+import hashlib
+import threading
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram_backend import caches
+from foodgram_backend.constants import AUTH_TOKEN_CACHE_TIMEOUT
+
+TOKEN_KEY = 'auth-token:{digest}'
+USER_TOKEN_KEY = 'auth-user-token:{user_id}'
+USER_FIELDS = ('id', 'is_superuser', 'is_staff', 'is_active')
+
+User = get_user_model()
+
+_stats_lock = threading.Lock()
+stats = Counter()
+
+
+def token_cache_key(key):
+    return TOKEN_KEY.format(digest=hashlib.sha256(key.encode()).hexdigest())
+
+
+def forget_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def forget_user(user_id):
+    user_key = USER_TOKEN_KEY.format(user_id=user_id)
+    token_key = cache.get(user_key)
+    cache.delete_many([user_key] if token_key is None
+                      else [user_key, token_key])
+
+
+def record(outcome):
+    with _stats_lock:
+        stats[outcome] += 1
+        return stats['hit'] / (stats['hit'] + stats['miss'])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    outcome = None
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if self.outcome is not None:
+            request._request.token_cache = self.outcome
+        return result
+
+    def authenticate_credentials(self, key):
+        if not caches.is_shared():
+            return super().authenticate_credentials(key)
+        token_key = token_cache_key(key)
+        values = cache.get(token_key)
+        self.outcome = 'miss' if values is None else 'hit'
+        if values is None:
+            values = Token.objects.filter(key=key).values_list(
+                *(f'user__{name}' for name in USER_FIELDS)).first()
+            if values is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        user = User.from_db(User.objects.db, USER_FIELDS, values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        if self.outcome == 'miss':
+            cache.set_many({
+                token_key: values,
+                USER_TOKEN_KEY.format(user_id=user.pk): token_key,
+            }, AUTH_TOKEN_CACHE_TIMEOUT)
+        return user, Token(key=key, user=user)
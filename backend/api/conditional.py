@@ -0,0 +1,64 @@
+from hashlib import md5
+from time import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+
+from foodgram_backend import caches
+from recipes.models import FavoriteRecipe, ShoppingList
+from users.models import Subscribe
+
+VIEWER_VERSION_KEY = 'viewer-version:{pk}'
+VIEWER_RELATIONS = ((FavoriteRecipe, 'user'), (ShoppingList, 'user'),
+                    (Subscribe, 'subscriber'))
+
+
+def get_viewer_state(user):
+    return tuple(
+        tuple(model.objects.filter(**{field: user}).aggregate(
+            Max('pk'), Count('pk')).values())
+        for model, field in VIEWER_RELATIONS)
+
+
+def get_viewer_version(user):
+    if not user.is_authenticated:
+        return 0
+    if not caches.is_shared():
+        return None
+    key = VIEWER_VERSION_KEY.format(pk=user.pk)
+    version = cache.get(key)
+    if version is None:
+        version = time()
+        cache.add(key, version, timeout=None)
+    return version
+
+
+def get_viewer_tag(user):
+    version = get_viewer_version(user)
+    return get_viewer_state(user) if version is None else version
+
+
+def bump_viewer_version(user_id):
+    cache.set(VIEWER_VERSION_KEY.format(pk=user_id), time(), timeout=None)
+
+
+def make_etag(*parts):
+    return quote_etag(md5(':'.join(map(str, parts)).encode()).hexdigest())
+
+
+def conditional_response(request, render, etag, last_modified=None):
+    if last_modified is not None:
+        last_modified = int(last_modified)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        response = render()
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization', ))
+    return response
@@ -1,15 +1,8 @@
 import django_filters
+from django.db.models import F
 
-from recipes.models import Ingredient, Recipe, Tag
-
-
-class IngredientFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(field_name='name',
-                                     lookup_expr='startswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ('name', )
+from recipes import search
+from recipes.models import Recipe, Tag
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -18,6 +11,10 @@ class RecipeFilter(django_filters.FilterSet):
         method='get_is_in_shopping_cart')
     author = django_filters.NumberFilter(field_name='author__id')
     tags = django_filters.AllValuesMultipleFilter(field_name='tags__slug')
+    search = django_filters.CharFilter(method='get_search')
+    ordering = django_filters.ChoiceFilter(
+        choices=(('popular', 'popular'), ('trending', 'trending')),
+        method='get_ordering')
     tags = django_filters.ModelMultipleChoiceFilter(field_name='tags__slug',
                                                     queryset=Tag.objects.all(),
                                                     to_field_name='slug')
@@ -29,11 +26,21 @@ class RecipeFilter(django_filters.FilterSet):
     def get_is_favorited(self, queryset, _, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(favorites__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, _, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(shopping__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
+
+    def get_search(self, queryset, _, value):
+        if not value.strip():
+            return queryset
+        return search.search(queryset, value)
+
+    def get_ordering(self, queryset, _, value):
+        return queryset.order_by(
+            F(f'ranking__{value}').desc(nulls_last=True),
+            '-created_at', '-id')
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.cache import cache
+
+RECIPE_FRAGMENT_KEY = 'recipe-fragment:{pk}:{version}:{base_url}'
+
+
+def get_recipe_version(recipe):
+    return int(recipe.updated_at.timestamp() * 1_000_000)
+
+
+def _get_fragment_keys(recipes, request):
+    base_url = request.build_absolute_uri('/') if request is not None else ''
+    return {recipe.pk: RECIPE_FRAGMENT_KEY.format(
+        pk=recipe.pk,
+        version=get_recipe_version(recipe),
+        base_url=base_url) for recipe in recipes}
+
+
+def get_recipe_fragments(recipes, request):
+    keys = _get_fragment_keys(recipes, request)
+    cached = cache.get_many(keys.values())
+    return {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+
+def set_recipe_fragments(recipes, fragments, request):
+    keys = _get_fragment_keys(recipes, request)
+    cache.set_many({keys[pk]: fragment
+                    for pk, fragment in fragments.items()},
+                   timeout=settings.RECIPE_FRAGMENT_TIMEOUT)
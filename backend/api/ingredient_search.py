@@ -0,0 +1,209 @@
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from foodgram_backend.constants import (INGREDIENT_SEARCH_LIMIT,
+                                        INGREDIENT_SEARCH_SIMILARITY,
+                                        INGREDIENT_SEARCH_TYPOS)
+from . import reference
+
+PREFIX_RANK, WORD_PREFIX_RANK, SUBSTRING_RANK, FUZZY_RANK = range(4)
+
+
+def normalize(text):
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def deletions(text):
+    return {text[:index] + text[index + 1:] for index in range(len(text))}
+
+
+def typo_prefixes(name):
+    return {(word[:end], end < len(word)) for word in name.split(' ')
+            for end in range(INGREDIENT_SEARCH_TYPOS[0] - 1, len(word) + 1)}
+
+
+def allowed_typos(query):
+    return sum(1 for length in INGREDIENT_SEARCH_TYPOS if len(query) >= length)
+
+
+def edit_distance(source, target, limit):
+    if abs(len(source) - len(target)) > limit:
+        return limit + 1
+    previous = list(range(len(target) + 1))
+    for row, char in enumerate(source, 1):
+        current = [row]
+        for column, other in enumerate(target, 1):
+            current.append(min(previous[column] + 1, current[-1] + 1,
+                               previous[column - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class IngredientSearchEngine:
+    def __init__(self, reference_cache, limit=INGREDIENT_SEARCH_LIMIT):
+        self.reference_cache = reference_cache
+        self.limit = limit
+        self._lock = threading.RLock()
+        self._version = None
+        self._names = {}
+        self._words = []
+        self._trigrams = defaultdict(set)
+        self._typo_keys = defaultdict(set)
+        self._typo_prefixes = defaultdict(set)
+
+    @staticmethod
+    def _word_entries(pk, name):
+        position = 0
+        for index, word in enumerate(name.split(' ')):
+            yield name[position:], pk, index
+            position += len(word) + 1
+
+    def add(self, pk, name):
+        name = normalize(name)
+        self._names[pk] = name
+        for entry in self._word_entries(pk, name):
+            insort(self._words, entry)
+        for gram in trigrams(name):
+            self._trigrams[gram].add(pk)
+        self._add_typo_prefixes(pk, name)
+
+    def _add_typo_prefixes(self, pk, name):
+        for prefix, partial in typo_prefixes(name):
+            if prefix not in self._typo_prefixes:
+                for key in deletions(prefix) | {prefix}:
+                    self._typo_keys[key].add(prefix)
+            self._typo_prefixes[prefix].add((pk, partial))
+
+    def remove(self, pk):
+        name = self._names.pop(pk, None)
+        if name is None:
+            return
+        for entry in self._word_entries(pk, name):
+            index = bisect_left(self._words, entry)
+            if index < len(self._words) and self._words[index] == entry:
+                del self._words[index]
+        for gram in trigrams(name):
+            postings = self._trigrams[gram]
+            postings.discard(pk)
+            if not postings:
+                del self._trigrams[gram]
+        for prefix, partial in typo_prefixes(name):
+            postings = self._typo_prefixes[prefix]
+            postings.discard((pk, partial))
+            if postings:
+                continue
+            del self._typo_prefixes[prefix]
+            for key in deletions(prefix) | {prefix}:
+                prefixes = self._typo_keys[key]
+                prefixes.discard(prefix)
+                if not prefixes:
+                    del self._typo_keys[key]
+
+    def _build(self, objects):
+        for pk, ingredient in objects.items():
+            name = normalize(ingredient.name)
+            self._names[pk] = name
+            self._words.extend(self._word_entries(pk, name))
+            for gram in trigrams(name):
+                self._trigrams[gram].add(pk)
+            self._add_typo_prefixes(pk, name)
+        self._words.sort()
+
+    def sync(self):
+        snapshot = self.reference_cache.get_snapshot()
+        if snapshot.version == self._version:
+            return
+        with self._lock:
+            if snapshot.version == self._version:
+                return
+            if not self._names:
+                self._build(snapshot.objects)
+                self._version = snapshot.version
+                return
+            for pk in set(self._names).difference(snapshot.objects):
+                self.remove(pk)
+            for pk, ingredient in snapshot.objects.items():
+                if self._names.get(pk) != normalize(ingredient.name):
+                    self.remove(pk)
+                    self.add(pk, ingredient.name)
+            self._version = snapshot.version
+
+    def _prefix_matches(self, query, ranks):
+        index = bisect_left(self._words, (query, ))
+        while index < len(self._words):
+            text, pk, position = self._words[index]
+            if not text.startswith(query):
+                break
+            rank = PREFIX_RANK if position == 0 else WORD_PREFIX_RANK
+            ranks[pk] = min(ranks.get(pk, rank), rank)
+            index += 1
+
+    def _substring_matches(self, query, ranks):
+        grams = [query[i:i + 3] for i in range(len(query) - 2)]
+        postings = sorted((self._trigrams.get(gram, set())
+                           for gram in grams), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        for pk in candidates:
+            if pk not in ranks and query in self._names[pk]:
+                ranks[pk] = SUBSTRING_RANK
+
+    def _fuzzy_matches(self, query, ranks):
+        grams = trigrams(query)
+        grams.discard(f'{query[-2:]} ')
+        scores = Counter()
+        for gram in grams:
+            scores.update(self._trigrams.get(gram, ()))
+        similarities = {}
+        for pk, shared in scores.items():
+            similarity = shared / len(grams)
+            if pk not in ranks and similarity >= INGREDIENT_SEARCH_SIMILARITY:
+                similarities[pk] = similarity
+        limit = allowed_typos(query)
+        if limit:
+            typos, checked = {}, set()
+            for key in deletions(query) | {query}:
+                for prefix in self._typo_keys.get(key, ()):
+                    if prefix in checked:
+                        continue
+                    checked.add(prefix)
+                    distance = edit_distance(query, prefix, limit)
+                    if distance > limit:
+                        continue
+                    for pk, partial in self._typo_prefixes[prefix]:
+                        typos[pk] = min(typos.get(pk, limit + 1),
+                                        distance + partial / 2)
+            for pk in typos.keys() - ranks.keys():
+                similarities[pk] = max(similarities.get(pk, 0),
+                                       1 - typos[pk] / len(query))
+        for pk in similarities:
+            ranks[pk] = FUZZY_RANK
+        return similarities
+
+    def search(self, query, limit=None):
+        query = normalize(query)
+        limit = limit or self.limit
+        if not query:
+            return []
+        with self._lock:
+            self.sync()
+            ranks = {}
+            similarities = {}
+            self._prefix_matches(query, ranks)
+            if len(query) >= 3:
+                self._substring_matches(query, ranks)
+                if len(ranks) < limit:
+                    similarities = self._fuzzy_matches(query, ranks)
+            return sorted(ranks, key=lambda pk: (ranks[pk],
+                                                 -similarities.get(pk, 0),
+                                                 self._names[pk]))[:limit]
+
+
+ingredients = IngredientSearchEngine(reference.ingredients)
@@ -0,0 +1,50 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from api import ingredient_search
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Compare ingredient autocomplete against the ORM startswith query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('No ingredients loaded')
+            return
+        rng = random.Random(options['seed'])
+        queries = []
+        for _ in range(options['queries']):
+            name = rng.choice(names)
+            start = rng.randrange(len(name))
+            queries.append(name[start:start + rng.randint(1, 6)])
+        engine = ingredient_search.IngredientSearchEngine(
+            ingredient_search.reference.ingredients)
+        started = perf_counter()
+        engine.sync()
+        self.stdout.write(
+            f'Index build: {(perf_counter() - started) * 1000:.1f} ms '
+            f'for {len(names)} ingredients')
+        self._report('ORM startswith', options['repeat'], queries,
+                     lambda query: list(Ingredient.objects.filter(
+                         name__startswith=query).values_list('pk',
+                                                             flat=True)))
+        self._report('Search engine', options['repeat'], queries,
+                     engine.search)
+
+    def _report(self, label, repeat, queries, search):
+        started = perf_counter()
+        for _ in range(repeat):
+            for query in queries:
+                search(query)
+        elapsed = perf_counter() - started
+        per_query = elapsed / (repeat * len(queries)) * 1_000_000
+        self.stdout.write(f'{label}: {per_query:.1f} µs per query')
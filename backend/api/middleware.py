@@ -0,0 +1,18 @@
+from .authentication import record
+
+
+class TokenCacheMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        outcome = getattr(request, 'token_cache', None)
+        if outcome is not None:
+            ratio = record(outcome)
+            metrics = (f'token-cache;desc="{outcome}", '
+                       f'token-cache-ratio;desc="{ratio:.3f}"')
+            if response.has_header('Server-Timing'):
+                metrics = f'{response["Server-Timing"]}, {metrics}'
+            response['Server-Timing'] = metrics
+        return response
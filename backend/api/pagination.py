@@ -1,5 +1,91 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram_backend.constants import INVALID_CURSOR_ERROR
+from recipes.models import TimelineEntry
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipePagination(CustomPageNumberPagination):
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param])
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(pk__lt=pk))
+        results = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            last = results[page_size - 1]
+            self.next_position = (last.created_at, last.pk)
+        return results[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param,
+                                   self.encode_cursor(*self.next_position))
+
+    @staticmethod
+    def encode_cursor(created_at, pk):
+        position = f'{created_at.isoformat()}|{pk}'
+        return urlsafe_b64encode(position.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            created_at, pk = urlsafe_b64decode(
+                cursor.encode()).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(INVALID_CURSOR_ERROR)
+        if created_at is None:
+            raise NotFound(INVALID_CURSOR_ERROR)
+        return created_at, pk
+
+
+class FeedPagination(RecipePagination):
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param))
+        rows = TimelineEntry.objects.feed(request.user, position,
+                                          page_size + 1)
+        self.next_position = (rows[page_size - 1] if len(rows) > page_size
+                              else None)
+        recipes = queryset.in_bulk([pk for _, pk in rows[:page_size]])
+        return [recipes[pk] for _, pk in rows[:page_size] if pk in recipes]
@@ -0,0 +1,90 @@
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from foodgram_backend.constants import PANTRY_BATCH_SIZE
+from recipes import changes
+from recipes.models import Recipe, RecipeIngredient
+
+
+class PantryIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+        self._postings = defaultdict(lambda: array('q'))
+        self._recipes = {}
+        self._created = {}
+
+    def _clear(self):
+        self._postings.clear()
+        self._recipes.clear()
+        self._created.clear()
+
+    def _remove(self, pk):
+        self._created.pop(pk, None)
+        for ingredient_id in self._recipes.pop(pk, ()):
+            postings = self._postings[ingredient_id]
+            index = bisect_left(postings, pk)
+            if index < len(postings) and postings[index] == pk:
+                postings.pop(index)
+            if not postings:
+                del self._postings[ingredient_id]
+
+    def _load(self, recipes):
+        created = dict(recipes.values_list('pk', 'created_at'))
+        ingredients = {pk: [] for pk in created}
+        pks = list(created)
+        for start in range(0, len(pks), PANTRY_BATCH_SIZE):
+            for pk, ingredient_id in RecipeIngredient.objects.filter(
+                    recipes__in=pks[start:start + PANTRY_BATCH_SIZE]
+            ).values_list('recipes', 'ingredients').order_by():
+                ingredients[pk].append(ingredient_id)
+        for pk, ingredient_ids in ingredients.items():
+            self._remove(pk)
+            self._created[pk] = (created[pk], pk)
+            self._recipes[pk] = tuple(ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                insort(self._postings[ingredient_id], pk)
+
+    def sync(self):
+        version = changes.get_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            pks = changes.changed_since(self._version, version)
+            if pks is None:
+                self._clear()
+                self._load(Recipe.objects.all())
+            else:
+                for pk in pks:
+                    self._remove(pk)
+                self._load(Recipe.objects.filter(pk__in=pks))
+            self._version = version
+
+    def match(self, include, exclude=(), mode='all'):
+        with self._lock:
+            self.sync()
+            postings = [self._postings.get(pk, ()) for pk in include]
+            if not include:
+                matches = set(self._recipes)
+            elif mode == 'all':
+                postings.sort(key=len)
+                matches = set(postings[0]).intersection(*postings[1:])
+            else:
+                matches = set().union(*postings)
+            for pk in exclude:
+                matches.difference_update(self._postings.get(pk, ()))
+            ranked = sorted(matches, key=self._created.__getitem__,
+                            reverse=True)
+            if mode != 'best' or not include:
+                return ranked
+            scores = Counter(pk for posting in postings for pk in posting
+                             if pk in matches)
+            return sorted(ranked, key=lambda pk: (
+                -scores[pk], len(self._recipes[pk]) - scores[pk]))
+
+
+index = PantryIndex()
@@ -0,0 +1,24 @@
+import json
+
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from foodgram_backend.constants import MULTIPART_DATA_ERROR
+
+DATA_PART = 'data'
+
+
+class MultiPartJSONParser(parsers.MultiPartParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        data = {key: value for key, value in result.data.items()
+                if key != DATA_PART}
+        if DATA_PART in result.data:
+            try:
+                payload = json.loads(result.data[DATA_PART])
+            except ValueError:
+                raise ParseError(MULTIPART_DATA_ERROR)
+            if not isinstance(payload, dict):
+                raise ParseError(MULTIPART_DATA_ERROR)
+            data.update(payload)
+        return parsers.DataAndFiles(data, result.files.dict())
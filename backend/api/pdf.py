@@ -0,0 +1,131 @@
+import zlib
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.ttfonts import (FF_NONSYMBOLIC, FF_SYMBOLIC, SUBSETN,
+                                       TTFont, makeToUnicodeCMap)
+
+FONT_NAME = 'ShoppingCartFont'
+
+
+@lru_cache(maxsize=None)
+def load_font(path):
+    return TTFont(FONT_NAME, path)
+
+
+class StreamingPDF:
+    catalog, pages, resources = 1, 2, 3
+
+    def __init__(self, font, page_size=A4, margin=56, font_size=12,
+                 title_size=16, leading=18):
+        self.font = font
+        self.width, self.height = page_size
+        self.margin = margin
+        self.font_size = font_size
+        self.title_size = title_size
+        self.leading = leading
+        self.offset = 0
+        self.offsets = {}
+        self.last_number = self.resources
+
+    def _allocate(self):
+        self.last_number += 1
+        return self.last_number
+
+    def _object(self, number, stream=None, **entries):
+        self.offsets[number] = self.offset
+        if stream is not None:
+            stream = zlib.compress(stream)
+            entries.update(Length=len(stream), Filter='/FlateDecode')
+        body = ' '.join(f'/{key} {value}' for key, value in entries.items())
+        chunk = f'{number} 0 obj\n<< {body} >>'.encode('latin-1')
+        if stream is not None:
+            chunk += b'\nstream\n' + stream + b'\nendstream'
+        chunk += b'\nendobj\n'
+        self.offset += len(chunk)
+        return chunk
+
+    def _show(self, text, x, y, size):
+        runs = ''.join(f'/F{subset} {size} Tf <{codes.hex()}> Tj '
+                       for subset, codes in self.font.splitString(text, self))
+        return f'BT {x:.2f} {y:.2f} Td {runs}ET\n'
+
+    def _page_contents(self, title, rows):
+        right = self.width - self.margin
+        y = self.height - self.margin - self.title_size
+        page = [self._show(title, self.margin, y, self.title_size)]
+        y -= self.leading * 2
+        for left_text, right_text in rows:
+            if y < self.margin:
+                yield ''.join(page)
+                page, y = [], self.height - self.margin - self.font_size
+            page.append(self._show(left_text, self.margin, y,
+                                   self.font_size))
+            x = right - self.font.stringWidth(right_text, self.font_size)
+            page.append(self._show(right_text, x, y, self.font_size))
+            y -= self.leading
+        yield ''.join(page)
+
+    def render(self, title, rows):
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self.offset = len(header)
+        yield header
+        yield self._object(self.catalog, Type='/Catalog',
+                           Pages=f'{self.pages} 0 R')
+        kids = []
+        for content in self._page_contents(title, rows):
+            contents = self._allocate()
+            yield self._object(contents, stream=content.encode('latin-1'))
+            kids.append(self._allocate())
+            yield self._object(
+                kids[-1], Type='/Page', Parent=f'{self.pages} 0 R',
+                MediaBox=f'[0 0 {self.width} {self.height}]',
+                Resources=f'{self.resources} 0 R',
+                Contents=f'{contents} 0 R')
+        yield self._object(self.pages, Type='/Pages',
+                           Kids='[{}]'.format(' '.join(
+                               f'{kid} 0 R' for kid in kids)),
+                           Count=len(kids))
+        yield from self._font_objects()
+        yield self._trailer()
+
+    def _font_objects(self):
+        face = self.font.face
+        subsets = self.font.state.pop(self).subsets
+        fonts = []
+        for number, subset in enumerate(subsets):
+            name = (SUBSETN(number) + b'+' + face.name).decode('latin-1')
+            data = face.makeSubset(subset)
+            font_file = self._allocate()
+            yield self._object(font_file, stream=data, Length1=len(data))
+            descriptor = self._allocate()
+            yield self._object(
+                descriptor, Type='/FontDescriptor', FontName=f'/{name}',
+                Flags=face.flags & ~FF_NONSYMBOLIC | FF_SYMBOLIC,
+                FontBBox='[{}]'.format(' '.join(map(str, face.bbox))),
+                ItalicAngle=face.italicAngle, Ascent=face.ascent,
+                Descent=face.descent, CapHeight=face.capHeight,
+                StemV=face.stemV, FontFile2=f'{font_file} 0 R')
+            to_unicode = self._allocate()
+            yield self._object(
+                to_unicode,
+                stream=makeToUnicodeCMap(name, subset).encode('latin-1'))
+            widths = ' '.join(str(face.getCharWidth(code)) for code in subset)
+            fonts.append(self._allocate())
+            yield self._object(
+                fonts[-1], Type='/Font', Subtype='/TrueType',
+                BaseFont=f'/{name}', FirstChar=0,
+                LastChar=len(subset) - 1, Widths=f'[{widths}]',
+                FontDescriptor=f'{descriptor} 0 R',
+                ToUnicode=f'{to_unicode} 0 R')
+        yield self._object(self.resources, Font='<< {} >>'.format(
+            ' '.join(f'/F{subset} {number} 0 R'
+                     for subset, number in enumerate(fonts))))
+
+    def _trailer(self):
+        size = self.last_number + 1
+        entries = ''.join(f'{self.offsets[number]:010d} 00000 n \n'
+                          for number in range(1, size))
+        return (f'xref\n0 {size}\n0000000000 65535 f \n{entries}'
+                f'trailer\n<< /Size {size} /Root {self.catalog} 0 R >>\n'
+                f'startxref\n{self.offset}\n%%EOF\n').encode()
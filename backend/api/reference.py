@@ -0,0 +1,103 @@
+import threading
+from collections import namedtuple
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+from foodgram_backend import caches
+from recipes.models import Ingredient, Tag
+
+Snapshot = namedtuple('Snapshot', ('version', 'objects', 'data', 'items'))
+
+
+class ReferenceCache:
+    version_key = 'reference-version:{name}'
+
+    def __init__(self, name, model, serializer_class):
+        self.name = name
+        self.model = model
+        self.serializer_class = serializer_class
+        self._lock = threading.Lock()
+        self._snapshot = Snapshot(None, {}, [], {})
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def get_version(self):
+        key = self.version_key.format(name=self.name)
+        version = cache.get(key)
+        if version is None:
+            version = uuid4().hex
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        if not caches.is_shared():
+            state = self.model.objects.aggregate(Max('pk'), Count('pk'))
+            version = f'{version}:{state["pk__max"]}:{state["pk__count"]}'
+        return version
+
+    def invalidate(self):
+        cache.set(self.version_key.format(name=self.name), uuid4().hex,
+                  timeout=None)
+
+    def invalidate_on_commit(self):
+        transaction.on_commit(self.invalidate)
+
+    def get_snapshot(self):
+        version = self.get_version()
+        if self._snapshot.version != version:
+            with self._lock:
+                if self._snapshot.version != version:
+                    self._snapshot = self._load(version)
+        return self._snapshot
+
+    def _load(self, version):
+        objects = list(self.model.objects.all())
+        serializer_class = import_string(self.serializer_class)
+        data = serializer_class(objects, many=True).data
+        return Snapshot(version,
+                        {obj.pk: obj for obj in objects},
+                        data,
+                        {item['id']: item for item in data})
+
+    @property
+    def objects(self):
+        return self.get_snapshot().objects
+
+    @property
+    def data(self):
+        return self.get_snapshot().data
+
+    def get_item(self, pk):
+        try:
+            return self.get_snapshot().items[int(pk)]
+        except (KeyError, TypeError, ValueError):
+            raise Http404
+
+
+tags = ReferenceCache('tags', Tag, 'api.serializers.TagSerializer')
+ingredients = ReferenceCache('ingredients', Ingredient,
+                             'api.serializers.IngredientSerializer')
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        kwargs.setdefault('queryset', reference.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.reference.objects[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
@@ -0,0 +1,109 @@
+import codecs
+import csv
+import json
+import os
+
+from django.conf import settings
+from rest_framework import exceptions, renderers
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from foodgram_backend.constants import (FORMAT_UNAVAILABLE_ERROR,
+                                        SHOPPING_CART_CSV_HEADER,
+                                        SHOPPING_CART_TITLE)
+from . import pdf
+
+STREAM_CHUNK_SIZE = 8 * 1024
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def buffered(chunks, size=STREAM_CHUNK_SIZE):
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class ShoppingCartRenderer(renderers.BaseRenderer):
+    charset = 'utf-8'
+    available = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    @property
+    def filename(self):
+        return f'shopping_list.{self.format}'
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        return buffered(f'{row["name"]}: {row["amount"]}'
+                        f'{row["measurement_unit"]} \n'.encode(self.charset)
+                        for row in rows)
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def _lines(self, rows):
+        writer = csv.writer(Echo())
+        yield codecs.BOM_UTF8
+        yield writer.writerow(SHOPPING_CART_CSV_HEADER).encode(self.charset)
+        for row in rows:
+            line = writer.writerow((row['name'], row['amount'],
+                                    row['measurement_unit']))
+            yield line.encode(self.charset)
+
+    def stream(self, rows):
+        return buffered(self._lines(rows))
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    @property
+    def available(self):
+        return os.path.isfile(settings.SHOPPING_CART_PDF_FONT)
+
+    def stream(self, rows):
+        lines = ((row['name'], f'{row["amount"]} {row["measurement_unit"]}')
+                 for row in rows)
+        document = pdf.StreamingPDF(
+            pdf.load_font(settings.SHOPPING_CART_PDF_FONT))
+        return document.render(SHOPPING_CART_TITLE, lines)
+
+
+class AvailableRendererNegotiation(DefaultContentNegotiation):
+    def select_renderer(self, request, renderers, format_suffix=None):
+        available = [renderer for renderer in renderers
+                     if getattr(renderer, 'available', True)]
+        requested = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE)
+        if requested and any(renderer.format == requested
+                             for renderer in renderers
+                             if renderer not in available):
+            raise exceptions.NotAcceptable(FORMAT_UNAVAILABLE_ERROR)
+        return super().select_renderer(request, available, format_suffix)
@@ -1,38 +1,136 @@
+from collections import defaultdict
+from io import BytesIO
+
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import MinValueValidator
-from django.db.models import F
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer as DjoserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, exceptions
 
+from . import reference
+from .fragments import get_recipe_fragments, set_recipe_fragments
 from foodgram_backend.constants import (IMAGE_REQUIERED_ERROR,
+                                        IMAGE_VARIANT_SIZES,
                                         INGREDIENT_REPEAT_ERROR,
                                         INGREDIENT_REQUIERED_ERROR,
-                                        REPEAT_ERROR,
+                                        PANTRY_IDS_ERROR, PANTRY_LIMIT_ERROR,
+                                        PANTRY_MATCH_MODES,
+                                        PANTRY_MAX_INGREDIENTS,
+                                        RECIPES_LIMIT_ERROR, REPEAT_ERROR,
                                         TAG_REPEAT_ERROR, TAG_REQUIERED_ERROR,
                                         SELF_SUBSCRIBE_ERROR)
+from foodgram_backend.images import probe_image, variants_field
 from recipes.models import (FavoriteRecipe, Recipe, RecipeIngredient,
-                            Ingredient, Tag, ShoppingList)
+                            Ingredient, ShoppingCartItem, Tag, ShoppingList)
 from users.models import Subscribe
 
 User = get_user_model()
 
 
-def is_subscribed(user, obj):
-    return (user
-            and user.is_authenticated
-            and Subscribe.objects.filter(subscriber=user,
-                                         user=obj).exists())
+class SubscriptionResolver:
+    def __init__(self, user):
+        self.user = user
+        self._subscribed = {}
+
+    def prime(self, author_ids):
+        if not self.user.is_authenticated:
+            return
+        missing = set(author_ids).difference(self._subscribed)
+        if not missing:
+            return
+        followed = set(Subscribe.objects.filter(
+            subscriber=self.user,
+            user__in=missing).values_list('user_id', flat=True))
+        self._subscribed.update(
+            (author_id, author_id in followed) for author_id in missing)
+
+    def is_subscribed(self, author_id):
+        if not self.user.is_authenticated:
+            return False
+        self.prime((author_id, ))
+        return self._subscribed[author_id]
+
+
+def get_subscription_resolver(request):
+    resolver = getattr(request, '_subscription_resolver', None)
+    if resolver is None:
+        resolver = SubscriptionResolver(request.user)
+        request._subscription_resolver = resolver
+    return resolver
+
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+    def prime(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        items = list(iterable)
+        request = self.context.get('request')
+        if request is not None:
+            field = self.child.subscription_author_field
+            get_subscription_resolver(request).prime(
+                getattr(item, field) for item in items)
+        return items
+
+    def to_representation(self, data):
+        return super().to_representation(self.prime(data))
+
+
+class RecipeListSerializer(SubscriptionListSerializer):
+    def to_representation(self, data):
+        return self.child.render_many(self.prime(data))
+
+
+class ImageVariantsField(serializers.Field):
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        if not image:
+            return None
+        variants = getattr(instance, variants_field(self.image_field))
+        if variants.get('source') != image.name:
+            variants = {}
+        request = self.context.get('request')
+        urls = {}
+        for variant in IMAGE_VARIANT_SIZES:
+            name = variants.get(variant)
+            url = image.storage.url(name) if name else image.url
+            urls[variant] = (request.build_absolute_uri(url)
+                             if request is not None else url)
+        return urls
+
+
+class UploadImageField(Base64ImageField):
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            if probe_image(data).lower() not in self.ALLOWED_TYPES:
+                raise exceptions.ValidationError(self.INVALID_TYPE_MESSAGE)
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+    def get_file_extension(self, filename, decoded_file):
+        probe_image(BytesIO(decoded_file))
+        return super().get_file_extension(filename, decoded_file)
 
 
 class UserSerializer(DjoserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
+    avatar_variants = ImageVariantsField('avatar')
+
+    subscription_author_field = 'pk'
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'password', 'is_subscribed', 'avatar')
+                  'password', 'is_subscribed', 'avatar', 'avatar_variants')
         extra_kwargs = {'password': {'write_only': True}}
+        list_serializer_class = SubscriptionListSerializer
 
     def create(self, validated_data):
         user = User(
@@ -45,8 +143,8 @@ class UserSerializer(DjoserSerializer):
         return user
 
     def get_is_subscribed(self, obj):
-        cur_user = self.context.get('request').user
-        return is_subscribed(cur_user, obj)
+        request = self.context.get('request')
+        return get_subscription_resolver(request).is_subscribed(obj.pk)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -62,7 +160,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = reference.CachedPrimaryKeyRelatedField(reference.ingredients)
     name = serializers.CharField(source='ingredients.name', read_only=True)
     measurement_unit = serializers.CharField(
         source='ingredients.measurement_unit',
@@ -73,12 +171,23 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount', 'name', 'measurement_unit', )
 
 
+class RecipeIngredientSafeSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredients_id')
+    name = serializers.CharField(source='ingredients.name')
+    measurement_unit = serializers.CharField(
+        source='ingredients.measurement_unit')
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount', )
+
+
 class RecipeUnsafeSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = reference.CachedPrimaryKeyRelatedField(reference.tags,
+                                                  many=True)
     ingredients = RecipeIngredientSerializer(many=True,
                                              source='recipeingredient')
-    image = Base64ImageField(required=True)
+    image = UploadImageField(required=True)
     cooking_time = serializers.IntegerField(
         validators=[MinValueValidator(1)])
 
@@ -97,10 +206,37 @@ class RecipeUnsafeSerializer(serializers.ModelSerializer):
             ingredients.append(ingredient)
         RecipeIngredient.objects.bulk_create(ingredients)
 
+    @staticmethod
+    def _update_ingredients(recipeingredient, recipe):
+        amounts = {ingr['id'].pk: ingr['amount'] for ingr in recipeingredient}
+        existing = {ingredient.ingredients_id: ingredient
+                    for ingredient in recipe.recipeingredient.all()}
+        removed = [ingredient.pk for ingredient_id, ingredient
+                   in existing.items() if ingredient_id not in amounts]
+        changed = []
+        for ingredient_id, ingredient in existing.items():
+            amount = amounts.get(ingredient_id, ingredient.amount)
+            if ingredient.amount != amount:
+                ingredient.amount = amount
+                changed.append(ingredient)
+        added = [RecipeIngredient(ingredients_id=ingredient_id,
+                                  recipes=recipe,
+                                  amount=amount)
+                 for ingredient_id, amount in amounts.items()
+                 if ingredient_id not in existing]
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount', ))
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        return bool(removed or changed or added)
+
     def to_representation(self, instance):
         serializer = RecipeSafeSerializer(instance, context=self.context)
         return serializer.data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags', None)
         recipeingredient_data = validated_data.pop('recipeingredient', None)
@@ -110,13 +246,14 @@ class RecipeUnsafeSerializer(serializers.ModelSerializer):
         self._create_ingredients(recipeingredient_data, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         tags_data = validated_data.pop('tags', None)
         recipeingredient_data = validated_data.pop('recipeingredient', None)
-        recipe.tags.clear()
         recipe.tags.set(tags_data)
-        recipe.ingredients.clear()
-        self._create_ingredients(recipeingredient_data, recipe)
+        if self._update_ingredients(recipeingredient_data, recipe):
+            ShoppingCartItem.objects.rebuild(
+                recipe.shopping.values_list('user_id', flat=True))
         return super().update(recipe, validated_data)
 
     def validate(self, attrs):
@@ -127,22 +264,17 @@ class RecipeUnsafeSerializer(serializers.ModelSerializer):
         return attrs
 
     def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        if not data:
             raise exceptions.ValidationError(INGREDIENT_REQUIERED_ERROR)
-        for ingredient in ingredients:
-            serializer = RecipeIngredientSerializer(data=ingredient)
-            serializer.is_valid(raise_exception=True)
-        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+        ingredient_ids = [ingredient['id'].pk for ingredient in data]
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise exceptions.ValidationError(INGREDIENT_REPEAT_ERROR)
         return data
 
     def validate_tags(self, data):
-        tags = self.initial_data.get('tags')
-        if not tags:
+        if not data:
             raise exceptions.ValidationError(TAG_REQUIERED_ERROR)
-        tag_ids = [tag for tag in tags]
+        tag_ids = [tag.pk for tag in data]
         if len(tag_ids) != len(set(tag_ids)):
             raise exceptions.ValidationError(TAG_REPEAT_ERROR)
         return data
@@ -156,45 +288,92 @@ class RecipeUnsafeSerializer(serializers.ModelSerializer):
 class RecipeSafeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
-    ingredients = serializers.SerializerMethodField()
+    ingredients = RecipeIngredientSafeSerializer(many=True,
+                                                 read_only=True,
+                                                 source='recipeingredient')
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = Base64ImageField(allow_null=False)
+    image_variants = ImageVariantsField('image')
+
+    subscription_author_field = 'author_id'
+    overlay_fields = ('is_favorited', 'is_in_shopping_cart',
+                      'favorites_count', )
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time', )
+                  'is_in_shopping_cart', 'favorites_count', 'name', 'image',
+                  'image_variants', 'text', 'cooking_time', )
+        list_serializer_class = RecipeListSerializer
 
-    def get_ingredients(self, obj):
-        recipe = obj
-        ingredients = recipe.ingredients.annotate(
-            amount=F('recipeingredient__amount')).values(
-            'id', 'name', 'amount', 'measurement_unit',)
-        return ingredients
+    @staticmethod
+    def get_prefetch():
+        return ('tags',
+                Prefetch('recipeingredient',
+                         queryset=RecipeIngredient.objects.select_related(
+                             'ingredients').order_by('ingredients__name')))
 
-    def get_is_favorited(self, obj):
+    def to_representation(self, instance):
+        return self.render_many([instance])[0]
+
+    def render_many(self, recipes):
+        request = self.context.get('request')
+        fragments = get_recipe_fragments(recipes, request)
+        missing = [recipe for recipe in recipes
+                   if recipe.pk not in fragments]
+        if missing:
+            prefetch_related_objects(missing, *self.get_prefetch())
+            rendered = {recipe.pk: self.render_fragment(recipe)
+                        for recipe in missing}
+            set_recipe_fragments(missing, rendered, request)
+            fragments.update(rendered)
+        return [self.apply_overlay(fragments[recipe.pk], recipe)
+                for recipe in recipes]
+
+    def render_fragment(self, recipe):
+        data = super().to_representation(recipe)
+        data.update(dict.fromkeys(self.overlay_fields))
+        data['author']['is_subscribed'] = None
+        return data
+
+    def apply_overlay(self, fragment, recipe):
+        request = self.context.get('request')
+        data = fragment.copy()
+        data['author'] = fragment['author'].copy()
+        data['author']['is_subscribed'] = get_subscription_resolver(
+            request).is_subscribed(recipe.author_id)
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        data['favorites_count'] = recipe.favorites_count
+        return data
+
+    def _get_user_flag(self, obj, flag, model):
+        if hasattr(obj, flag):
+            return getattr(obj, flag)
         cur_user = self.context.get('request').user
-        return (cur_user
-                and cur_user.is_authenticated
-                and FavoriteRecipe.objects.filter(recipe=obj,
-                                                  user=cur_user).exists())
+        value = bool(cur_user
+                     and cur_user.is_authenticated
+                     and model.objects.filter(recipe=obj,
+                                              user=cur_user).exists())
+        setattr(obj, flag, value)
+        return value
+
+    def get_is_favorited(self, obj):
+        return self._get_user_flag(obj, 'is_favorited', FavoriteRecipe)
 
     def get_is_in_shopping_cart(self, obj):
-        cur_user = self.context.get('request').user
-        return (cur_user
-                and cur_user.is_authenticated
-                and ShoppingList.objects.filter(recipe=obj,
-                                                user=cur_user).exists())
+        return self._get_user_flag(obj, 'is_in_shopping_cart',
+                                   ShoppingList)
 
 
 class FavoriteShoppingResponseSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(required=True)
+    image_variants = ImageVariantsField('image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time', )
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time', )
 
 
 class RecipeUserBaseSerializer(serializers.ModelSerializer):
@@ -219,34 +398,73 @@ class ShoppingListSerializer(RecipeUserBaseSerializer):
         fields = '__all__'
 
 
+class ShoppingCartItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = ShoppingCartItem
+        fields = ('id', 'name', 'measurement_unit', 'amount', )
+
+
+def get_recipes_limit(request):
+    value = request.query_params.get('recipes_limit')
+    if not value:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise exceptions.ValidationError(RECIPES_LIMIT_ERROR)
+    if limit < 1:
+        raise exceptions.ValidationError(RECIPES_LIMIT_ERROR)
+    return limit
+
+
+class SubscribeListSerializer(SubscriptionListSerializer):
+    def prime(self, data):
+        items = super().prime(data)
+        request = self.context.get('request')
+        previews = defaultdict(list)
+        for recipe in Recipe.objects.latest_per_author(
+                [item.pk for item in items], get_recipes_limit(request)):
+            previews[recipe.author_id].append(recipe)
+        for item in items:
+            item.recipe_previews = previews[item.pk]
+        return items
+
+
 class SubscribeResponseSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
     is_subscribed = serializers.SerializerMethodField(read_only=True)
+    avatar_variants = ImageVariantsField('avatar')
+
+    subscription_author_field = 'pk'
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count', 'avatar', )
+                  'is_subscribed', 'recipes', 'recipes_count',
+                  'subscribers_count', 'avatar', 'avatar_variants', )
         read_only_fields = ('email', 'username', 'last_name',
-                            'first_name', 'avatar')
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+                            'first_name', 'avatar', 'recipes_count',
+                            'subscribers_count', )
+        list_serializer_class = SubscribeListSerializer
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get('request').GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        recipes = getattr(obj, 'recipe_previews', None)
+        if recipes is None:
+            recipes = obj.recipes.all()[:get_recipes_limit(
+                self.context.get('request'))]
         serializer = FavoriteShoppingResponseSerializer(recipes,
                                                         many=True,
                                                         read_only=True)
         return serializer.data
 
     def get_is_subscribed(self, obj):
-        cur_user = self.context.get('request').user
-        return is_subscribed(cur_user, obj)
+        request = self.context.get('request')
+        return get_subscription_resolver(request).is_subscribed(obj.pk)
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -266,8 +484,31 @@ class SubscribeSerializer(serializers.ModelSerializer):
 
 
 class AvatarSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField(allow_null=True)
+    avatar = UploadImageField(allow_null=True)
 
     class Meta:
         model = User
         fields = ('avatar', )
+
+
+class PantryQuerySerializer(serializers.Serializer):
+    ingredients = serializers.CharField(required=False, default='')
+    exclude_ingredients = serializers.CharField(required=False, default='')
+    match = serializers.ChoiceField(choices=PANTRY_MATCH_MODES,
+                                    default=PANTRY_MATCH_MODES[0])
+
+    @staticmethod
+    def _ids(value):
+        try:
+            ids = {int(pk) for pk in value.split(',') if pk.strip()}
+        except ValueError:
+            raise serializers.ValidationError(PANTRY_IDS_ERROR)
+        if len(ids) > PANTRY_MAX_INGREDIENTS:
+            raise serializers.ValidationError(PANTRY_LIMIT_ERROR)
+        return ids
+
+    def validate_ingredients(self, value):
+        return self._ids(value)
+
+    def validate_exclude_ingredients(self, value):
+        return self._ids(value)
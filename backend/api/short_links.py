@@ -0,0 +1,166 @@
+import atexit
+import logging
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime
+from time import monotonic
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.http import Http404
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from shortener.models import UrlMap
+
+from foodgram_backend.constants import (SHORT_LINK_CACHE_SIZE,
+                                        SHORT_LINK_CONFLICT_ERROR,
+                                        SHORT_LINK_FLUSH_HITS,
+                                        SHORT_LINK_FLUSH_INTERVAL)
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz23456789'
+CODE_PREFIX = '1'
+CODE_KEY = 'short-link:{recipe_id}'
+VERSION_KEY = 'short-link-version'
+NEVER = timezone.make_aware(datetime.max, timezone.utc)
+
+
+def encode(number):
+    digits = []
+    while True:
+        number, digit = divmod(number, len(ALPHABET))
+        digits.append(ALPHABET[digit])
+        if not number:
+            return CODE_PREFIX + ''.join(reversed(digits))
+
+
+def recipe_path(recipe_id):
+    return f'/recipes/{recipe_id}/'
+
+
+def recipe_codes(recipe_id):
+    code = encode(recipe_id)
+    return code, CODE_PREFIX + code
+
+
+def recipe_short_code(recipe_id):
+    try:
+        recipe_id = int(recipe_id)
+    except (TypeError, ValueError):
+        raise Http404
+    key = CODE_KEY.format(recipe_id=recipe_id)
+    code = cache.get(key)
+    if code is not None:
+        return code
+    author_id = Recipe.objects.filter(pk=recipe_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        raise Http404
+    path = recipe_path(recipe_id)
+    for code in recipe_codes(recipe_id):
+        link, _ = UrlMap.objects.get_or_create(
+            short_url=code,
+            defaults={'user_id': author_id, 'full_url': path,
+                      'date_expired': NEVER})
+        if link.full_url == path:
+            cache.set(key, code, timeout=None)
+            return code
+        logger.warning('Short link %s already points to %s', code,
+                       link.full_url)
+    raise APIException(SHORT_LINK_CONFLICT_ERROR)
+
+
+def forget_recipe(recipe_id):
+    cache.delete(CODE_KEY.format(recipe_id=recipe_id))
+    UrlMap.objects.filter(short_url__in=recipe_codes(recipe_id),
+                          full_url=recipe_path(recipe_id)).delete()
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def invalidate():
+    cache.set(VERSION_KEY, uuid4().hex, timeout=None)
+
+
+class ShortLinkResolver:
+    def __init__(self, maxsize, flush_hits, flush_interval):
+        self.maxsize = maxsize
+        self.flush_hits = flush_hits
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._links = OrderedDict()
+        self._hits = Counter()
+        self._flushed_at = monotonic()
+        self._version = None
+
+    def resolve(self, code):
+        version = get_version()
+        with self._lock:
+            if version != self._version:
+                self._links.clear()
+                self._version = version
+            link = self._links.get(code)
+            if link is not None:
+                self._links.move_to_end(code)
+        if link is None:
+            link = UrlMap.objects.filter(short_url=code).values_list(
+                'full_url', 'date_expired', 'max_count',
+                'usage_count').first()
+            if link is None:
+                return None
+            if link[2] == -1:
+                self._remember(code, link)
+        full_url, expires, max_count, usage_count = link
+        if timezone.now() > expires:
+            return None
+        with self._lock:
+            if max_count != -1 and usage_count + self._hits[code] >= max_count:
+                return None
+            self._hits[code] += 1
+            due = (sum(self._hits.values()) >= self.flush_hits
+                   or monotonic() - self._flushed_at >= self.flush_interval)
+        if due:
+            self.flush()
+        return full_url
+
+    def _remember(self, code, link):
+        with self._lock:
+            self._links[code] = link
+            while len(self._links) > self.maxsize:
+                self._links.popitem(last=False)
+
+    def flush(self):
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._flushed_at = monotonic()
+        if not hits:
+            return
+        codes_by_count = defaultdict(list)
+        for code, count in hits.items():
+            codes_by_count[count].append(code)
+        try:
+            with transaction.atomic():
+                for count, codes in codes_by_count.items():
+                    UrlMap.objects.filter(short_url__in=codes).update(
+                        usage_count=F('usage_count') + count)
+        except DatabaseError:
+            logger.exception('Cannot flush %s short link hits',
+                             sum(hits.values()))
+            with self._lock:
+                self._hits.update(hits)
+
+
+resolver = ShortLinkResolver(SHORT_LINK_CACHE_SIZE, SHORT_LINK_FLUSH_HITS,
+                             SHORT_LINK_FLUSH_INTERVAL)
+atexit.register(resolver.flush)
@@ -0,0 +1,64 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from shortener.models import UrlMap
+
+from foodgram_backend.images import variants_ready
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingList,
+                            Tag)
+from users.models import Subscribe
+from . import authentication, reference, short_links
+from .conditional import bump_viewer_version
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+@receiver((post_save, post_delete), sender=ShoppingList)
+def user_recipes_changed(sender, instance, **kwargs):
+    bump_viewer_version(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def subscription_changed(sender, instance, **kwargs):
+    bump_viewer_version(instance.subscriber_id)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    reference.tags.invalidate_on_commit()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    reference.ingredients.invalidate_on_commit()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(short_links.forget_recipe, instance.pk))
+
+
+@receiver((post_save, post_delete), sender=UrlMap)
+def short_link_changed(sender, created=False, **kwargs):
+    if not created:
+        transaction.on_commit(short_links.invalidate)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    authentication.forget_token(instance.key)
+
+
+@receiver((post_save, post_delete), sender=User)
+def user_changed(sender, instance, **kwargs):
+    authentication.forget_user(instance.pk)
+
+
+@receiver(variants_ready, sender=User)
+def avatar_variants_ready(sender, pk, **kwargs):
+    authentication.forget_user(pk)
@@ -1,35 +1,49 @@
-import os
-
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Sum
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import Http404, FileResponse
+from django.http import (Http404, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.urls import reverse
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import SAFE_METHODS
-from shortener import shortener
 
-from foodgram_backend.constants import NOT_EXIST_ERROR, REPEAT_ERROR
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPageNumberPagination
+from foodgram_backend.constants import (NOT_EXIST_ERROR, PANTRY_BATCH_SIZE,
+                                        REPEAT_ERROR)
+from . import ingredient_search, pantry, reference, short_links
+from .conditional import (conditional_response, get_viewer_tag,
+                          get_viewer_version, make_etag)
+from .fragments import get_recipe_version
+from .filters import RecipeFilter
+from .pagination import (CustomPageNumberPagination, FeedPagination,
+                         RecipePagination)
+from .parsers import MultiPartJSONParser
 from .permissions import AuthorOrSafeMethodsOnly
+from .renderers import (AvailableRendererNegotiation, ShoppingCartCSVRenderer,
+                        ShoppingCartPDFRenderer, ShoppingCartTextRenderer)
 from .serializers import (AvatarSerializer, UserSerializer,
                           FavoriteSerializer,
                           FavoriteShoppingResponseSerializer,
-                          IngredientSerializer, RecipeSafeSerializer,
+                          IngredientSerializer, PantryQuerySerializer,
+                          RecipeSafeSerializer,
                           RecipeUnsafeSerializer, TagSerializer,
                           SubscribeSerializer, SubscribeResponseSerializer,
-                          ShoppingListSerializer, )
+                          ShoppingCartItemSerializer, ShoppingListSerializer,
+                          get_subscription_resolver)
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingList, Tag)
+                            RecipeRanking, ShoppingCartItem, ShoppingList,
+                            Tag)
 from users.models import Subscribe
 
 User = get_user_model()
 
+PANTRY_PARAMS = frozenset(('ingredients', 'exclude_ingredients', 'match'))
+
 
 class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all()
@@ -49,12 +63,14 @@ class UserViewSet(DjoserUserViewSet):
         serializer.save()
         data = serializer.data
         data.pop('avatar', None)
+        data.pop('avatar_variants', None)
         data.pop('is_subscribed', None)
         return Response(data, status=status.HTTP_201_CREATED)
 
     @action(['PUT', 'DELETE'],
             detail=False,
             url_path='me/avatar',
+            parser_classes=(JSONParser, MultiPartJSONParser),
             permission_classes=(permissions.IsAuthenticated, ))
     def avatar(self, request):
         user = request.user
@@ -65,11 +81,8 @@ class UserViewSet(DjoserUserViewSet):
             user.save()
             avatar_url = request.build_absolute_uri(user.avatar.url)
             return Response({'avatar': avatar_url}, status=status.HTTP_200_OK)
-        try:
-            os.remove(user.avatar.path)
-        finally:
-            user.avatar = None
-            user.save()
+        user.avatar = None
+        user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(['POST'],
@@ -79,11 +92,12 @@ class UserViewSet(DjoserUserViewSet):
         subscriber = request.user
         data = {'subscriber': subscriber.pk, 'user': user.pk}
         serializer = SubscribeSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        user.refresh_from_db(fields=('subscribers_count', ))
         serializer_response = SubscribeResponseSerializer(
             user,
             context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer_response.data,
                         status=status.HTTP_201_CREATED)
 
@@ -102,7 +116,8 @@ class UserViewSet(DjoserUserViewSet):
     @action(detail=False,
             permission_classes=(permissions.IsAuthenticated, ))
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__subscriber=request.user)
+        queryset = User.objects.filter(
+            following__subscriber=request.user).order_by('pk')
         serializer = SubscribeResponseSerializer(
             self.paginate_queryset(queryset), many=True,
             context={'request': request})
@@ -110,27 +125,111 @@ class UserViewSet(DjoserUserViewSet):
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().select_related(
-        'author').prefetch_related(
-            'tags', 'ingredients', 'recipeingredient__ingredients')
+    queryset = Recipe.objects.all().select_related('author').defer(
+        'search_vector')
     permission_classes = (AuthorOrSafeMethodsOnly, )
-    pagination_class = CustomPageNumberPagination
+    parser_classes = (JSONParser, MultiPartJSONParser)
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(FavoriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                    user=user, recipe=OuterRef('pk'))))
+        return queryset
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeSafeSerializer
         return RecipeUnsafeSerializer
 
-    def _create_txt(self, data, filename):
-        with open(filename, 'w', encoding='utf-8') as file:
-            for item in data:
-                file.write(f'{item["ingredients__name"]}: '
-                           f'{item["amount"]}'
-                           f'{item["ingredients__measurement_unit"]} \n')
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not PANTRY_PARAMS.isdisjoint(request.query_params):
+            return self._pantry_list(request, queryset)
+        state = queryset.aggregate(updated_at=Max('updated_at'),
+                                   count=Count('pk'),
+                                   favorites=Sum('favorites_count'))
+        ranked_at = (RecipeRanking.objects.values_list(
+            'computed_at', flat=True).first()
+            if 'ordering' in request.query_params else None)
+        etag = make_etag(state['updated_at'], state['count'],
+                         state['favorites'], ranked_at,
+                         get_viewer_tag(request.user))
+        return conditional_response(request,
+                                    lambda: self._render_list(queryset),
+                                    etag)
+
+    def _render_list(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def _pantry_list(self, request, queryset):
+        params = PantryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ids = pantry.index.match(params.validated_data['ingredients'],
+                                 params.validated_data['exclude_ingredients'],
+                                 params.validated_data['match'])
+        if queryset.query.where:
+            ids = self._filter_pantry_ids(queryset, ids)
+        paginator = CustomPageNumberPagination()
+        page = paginator.paginate_queryset(ids, request, self)
+        state = queryset.filter(pk__in=page).aggregate(
+            updated_at=Max('updated_at'), favorites=Sum('favorites_count'))
+        etag = make_etag(len(ids), *page, state['updated_at'],
+                         state['favorites'], get_viewer_tag(request.user))
+        return conditional_response(
+            request,
+            lambda: self._render_pantry_page(queryset, page, paginator),
+            etag)
 
     @staticmethod
+    def _filter_pantry_ids(queryset, ids):
+        queryset = queryset.order_by()
+        allowed = set()
+        for start in range(0, len(ids), PANTRY_BATCH_SIZE):
+            allowed.update(queryset.filter(
+                pk__in=ids[start:start + PANTRY_BATCH_SIZE]).values_list(
+                'pk', flat=True))
+        return [pk for pk in ids if pk in allowed]
+
+    def _render_pantry_page(self, queryset, page, paginator):
+        recipes = queryset.in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in page if pk in recipes], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        resolver = get_subscription_resolver(request)
+        etag = make_etag(recipe.pk,
+                         get_recipe_version(recipe),
+                         recipe.favorites_count,
+                         getattr(recipe, 'is_favorited', False),
+                         getattr(recipe, 'is_in_shopping_cart', False),
+                         resolver.is_subscribed(recipe.author_id))
+        viewer_version = get_viewer_version(request.user)
+        last_modified = (None if viewer_version is None
+                         else max(recipe.updated_at.timestamp(),
+                                  viewer_version))
+        return conditional_response(
+            request,
+            lambda: Response(self.get_serializer(recipe).data),
+            etag,
+            last_modified)
+
+    @staticmethod
+    @transaction.atomic
     def _favorite_shopping_list_post(request, model, recipe_pk,
                                      serializerclass):
         recipe = get_object_or_404(Recipe, pk=recipe_pk)
@@ -146,6 +245,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_201_CREATED)
 
     @staticmethod
+    @transaction.atomic
     def _favorite_shopping_list_delete(request, model, recipe_pk):
         recipe = get_object_or_404(Recipe, pk=recipe_pk)
         user = request.user.id
@@ -180,40 +280,101 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self._favorite_shopping_list_delete(request, ShoppingList, pk)
 
     @action(methods=['GET'], detail=False,
-            permission_classes=(permissions.IsAuthenticated, ))
+            permission_classes=(permissions.IsAuthenticated, ),
+            renderer_classes=(ShoppingCartTextRenderer,
+                              ShoppingCartCSVRenderer,
+                              ShoppingCartPDFRenderer),
+            content_negotiation_class=AvailableRendererNegotiation)
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipes__shopping__user=request.user).values(
-            'ingredients__name',
-            'ingredients__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        self._create_txt(ingredients, 'shopping_list.txt')
-        return FileResponse(open('shopping_list.txt', "rb"),
-                            as_attachment=True,
-                            filename="shopping_List.txt",
-                            content_type='text/plain')
+        rows = ShoppingCartItem.objects.filter(user=request.user).values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')
+        ).order_by('name')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(rows.iterator()),
+            content_type=renderer.content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{renderer.filename}"')
+        return response
+
+    @action(methods=['GET'], detail=False,
+            permission_classes=(permissions.IsAuthenticated, ))
+    def shopping_cart_summary(self, request):
+        items = ShoppingCartItem.objects.filter(
+            user=request.user).select_related('ingredient').order_by(
+            'ingredient__name')
+        return Response(ShoppingCartItemSerializer(items, many=True).data)
+
+    @action(methods=['GET'], detail=False,
+            permission_classes=(permissions.IsAuthenticated, ),
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=False,
+            pagination_class=CustomPageNumberPagination)
+    def trending(self, request):
+        queryset = self.get_queryset().filter(
+            ranking__trending__gt=0).order_by('-ranking__trending',
+                                              '-ranking__recipe')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=True, pagination_class=None)
+    def similar(self, request, pk):
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        recipes = self.get_queryset().filter(
+            neighbour_of__recipe=recipe).order_by('neighbour_of__rank')
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
 
     @action(methods=['GET'], detail=True, url_path='get-link')
     def get_short_link(self, request, pk):
-        original_url = request.build_absolute_uri(reverse('recipe-detail',
-                                                          args=(pk, )))
-        original_url = original_url.replace('api/', '')
-        user = (request.user if request.user.is_authenticated
-                else User.objects.get_or_create(username='guest')[0])
-        short_link = shortener.create(user, original_url)
-        link = request.build_absolute_uri(f'/s/{short_link}')
+        code = short_links.recipe_short_code(pk)
+        link = request.build_absolute_uri(reverse('short-link',
+                                                  args=(code, )))
         return Response({'short-link': link})
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def short_link_redirect(request, code):
+    url = short_links.resolver.resolve(code)
+    if url is None:
+        raise Http404
+    return HttpResponseRedirect(url)
+
+
+class ReferenceViewSet(viewsets.ReadOnlyModelViewSet):
+    pagination_class = None
+    reference_cache = None
+
+    def list(self, request, *args, **kwargs):
+        return Response(self.reference_cache.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.reference_cache.get_item(self.kwargs['pk']))
+
+
+class TagViewSet(ReferenceViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    pagination_class = None
+    reference_cache = reference.tags
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    pagination_class = None
-    filter_backends = (DjangoFilterBackend, )
-    filterset_class = IngredientFilter
+    reference_cache = reference.ingredients
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        items = self.reference_cache.get_snapshot().items
+        return Response([items[pk]
+                         for pk in ingredient_search.ingredients.search(name)
+                         if pk in items])
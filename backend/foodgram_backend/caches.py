@@ -0,0 +1,10 @@
+from django.conf import settings
+
+PROCESS_LOCAL_BACKENDS = frozenset((
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+))
+
+
+def is_shared(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
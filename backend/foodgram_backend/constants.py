@@ -18,3 +18,52 @@ TAG_NAME_LENGTH = INGREDIENT_NAME_LENGTH = RECIPE_NAME_LENGTH = 64
 INGREDIENT_UNIT_LENGTH = TAG_SLUG_LENGTH = 32
 RECIPE_TEXT_LENGTH = 256
 MIN_VALUE_ERROR = "Это поле должно быть больше нуля"
+INVALID_CURSOR_ERROR = 'Неверный курсор'
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_SEARCH_SIMILARITY = 0.6
+INGREDIENT_SEARCH_TYPOS = (4, 8)
+FORMAT_UNAVAILABLE_ERROR = 'Этот формат сейчас недоступен'
+SHOPPING_CART_TITLE = 'Список покупок'
+SHOPPING_CART_CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+SHOPPING_CART_BATCH_SIZE = 1000
+RECIPES_LIMIT_ERROR = {'recipes_limit':
+                       'Должно быть целым положительным числом'}
+ESTIMATED_COUNT_THRESHOLD = 10000
+IMAGE_VARIANT_SIZES = {'thumbnail': (160, 160),
+                       'card': (480, 480),
+                       'full': (1280, 1280)}
+IMAGE_VARIANT_QUALITY = 82
+IMAGE_MAX_DIMENSION = 8000
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_INVALID_ERROR = 'Загрузите корректное изображение'
+IMAGE_TOO_LARGE_ERROR = 'Изображение слишком большое'
+MULTIPART_DATA_ERROR = 'Поле data должно содержать JSON-объект'
+SHORT_LINK_CACHE_SIZE = 10000
+SHORT_LINK_FLUSH_HITS = 100
+SHORT_LINK_FLUSH_INTERVAL = 30
+SHORT_LINK_CONFLICT_ERROR = 'Не удалось создать короткую ссылку'
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 100
+FEED_FANOUT_BATCH_SIZE = 1000
+RECIPE_SEARCH_CONFIG = 'russian'
+RECIPE_SEARCH_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+PANTRY_MATCH_MODES = ('all', 'any', 'best')
+PANTRY_MAX_INGREDIENTS = 100
+PANTRY_BATCH_SIZE = 500
+RECIPE_CHANGES_LIMIT = 1000
+RECIPE_CHANGES_TIMEOUT = 60 * 60
+PANTRY_IDS_ERROR = 'Передайте id ингредиентов через запятую'
+PANTRY_LIMIT_ERROR = (f'Можно передать не больше {PANTRY_MAX_INGREDIENTS} '
+                      f'ингредиентов')
+RANKING_FAVORITE_WEIGHT = 1.0
+RANKING_SHOPPING_WEIGHT = 1.5
+POPULAR_HALF_LIFE = 30 * 24 * 60 * 60
+TRENDING_HALF_LIFE = 24 * 60 * 60
+TRENDING_WINDOW = 7 * 24 * 60 * 60
+RANKING_BATCH_SIZE = 1000
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_TAG_WEIGHT = 0.5
+SIMILAR_BATCH_SIZE = 1024
+SIMILAR_MAX_FEATURE_SHARE = 0.2
+SIMILAR_STOP_FEATURES_MIN_RECIPES = 1000
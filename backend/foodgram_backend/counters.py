@@ -0,0 +1,12 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def shift_counter(queryset, field, delta):
+    return queryset.update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def count_related(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
@@ -0,0 +1,120 @@
+import logging
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps, features
+
+from foodgram_backend.constants import (IMAGE_INVALID_ERROR,
+                                        IMAGE_MAX_DIMENSION, IMAGE_MAX_PIXELS,
+                                        IMAGE_TOO_LARGE_ERROR,
+                                        IMAGE_VARIANT_QUALITY,
+                                        IMAGE_VARIANT_SIZES)
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+VARIANT_EXTENSION = {'WEBP': 'webp', 'JPEG': 'jpg'}[VARIANT_FORMAT]
+
+variants_ready = Signal()
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='image-variants')
+    return _executor
+
+
+def probe_image(file):
+    position = file.tell()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(file) as image:
+                width, height = image.size
+                image_format = image.format
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ValidationError(IMAGE_TOO_LARGE_ERROR)
+    except (OSError, SyntaxError, ValueError):
+        raise ValidationError(IMAGE_INVALID_ERROR)
+    finally:
+        file.seek(position)
+    if (max(width, height) > IMAGE_MAX_DIMENSION
+            or width * height > IMAGE_MAX_PIXELS):
+        raise ValidationError(IMAGE_TOO_LARGE_ERROR)
+    return image_format
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def variant_name(name, variant):
+    root = os.path.splitext(name)[0]
+    return f'{root}.{variant}.{VARIANT_EXTENSION}'
+
+
+def render_variants(storage, name):
+    with storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        if VARIANT_FORMAT == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB' if VARIANT_FORMAT == 'JPEG'
+                                  else 'RGBA')
+        variants = {'source': name}
+        for variant, size in IMAGE_VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, VARIANT_FORMAT,
+                         quality=IMAGE_VARIANT_QUALITY, optimize=True)
+            variants[variant] = storage.save(
+                variant_name(name, variant), ContentFile(buffer.getvalue()))
+    return variants
+
+
+def generate_variants(model, pk, field_name, name):
+    try:
+        storage = model._meta.get_field(field_name).storage
+        variants = render_variants(storage, name)
+        updated = model.objects.filter(
+            pk=pk, **{field_name: name}).update(
+            **{variants_field(field_name): variants})
+        if updated:
+            variants_ready.send(sender=model, pk=pk, field_name=field_name)
+        return variants
+    except Exception:
+        logger.exception('Cannot generate variants for %s', name)
+
+
+def generate_in_thread(*args):
+    try:
+        return generate_variants(*args)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(instance, field_name):
+    image = getattr(instance, field_name)
+    variants = getattr(instance, variants_field(field_name))
+    model = type(instance)
+    if not image:
+        if variants:
+            model.objects.filter(pk=instance.pk).update(
+                **{variants_field(field_name): {}})
+        return
+    if variants.get('source') == image.name:
+        return
+    transaction.on_commit(partial(get_executor().submit, generate_in_thread,
+                                  model, instance.pk, field_name, image.name))
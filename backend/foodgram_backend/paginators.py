@@ -0,0 +1,27 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from foodgram_backend.constants import ESTIMATED_COUNT_THRESHOLD
+
+
+class EstimatedCountPaginator(Paginator):
+    def _estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                           (queryset.model._meta.db_table, ))
+            row = cursor.fetchone()
+        if row is None or row[0] < ESTIMATED_COUNT_THRESHOLD:
+            return None
+        return int(row[0])
+
+    @cached_property
+    def count(self):
+        estimate = self._estimate()
+        if estimate is None:
+            return super().count
+        return estimate
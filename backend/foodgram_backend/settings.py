@@ -43,6 +43,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.TokenCacheMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram_backend.urls'
@@ -88,6 +89,26 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.memcached.PyMemcacheCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION',
+                              '' if DEBUG else 'cache:11211'),
+    }
+}
+
+RECIPE_FRAGMENT_TIMEOUT = 60 * 60
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -128,6 +149,8 @@ STATIC_URL = '/backend_static/'
 STATIC_ROOT = BASE_DIR / 'backend_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+DEFAULT_FILE_STORAGE = 'foodgram_backend.storage.ContentAddressedStorage'
+MEDIA_GC_MIN_AGE = int(os.getenv('MEDIA_GC_MIN_AGE', 60 * 60))
 ROOT_URLCONF = 'foodgram_backend.urls'
 
 # Default primary key field type
@@ -139,9 +162,13 @@ AUTH_USER_MODEL = 'users.User'
 
 PAGINATION_PAGE_SIZE = 6
 
+FILE_UPLOAD_HANDLERS = (
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
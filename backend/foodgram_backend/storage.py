@@ -0,0 +1,46 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CONTENT_DIRECTORY = 'content'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, digest):
+        extension = os.path.splitext(name)[1].lower()
+        if extension == '.jpeg':
+            extension = '.jpg'
+        return f'{CONTENT_DIRECTORY}/{digest[:2]}/{digest}{extension}'
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content_hash(content))
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def walk(self, directory=''):
+        with os.scandir(self.path(directory)) as entries:
+            for entry in entries:
+                name = os.path.join(directory, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self.walk(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name.replace(os.sep, '/'), entry.stat().st_mtime
@@ -3,26 +3,43 @@ from django.contrib.auth.models import Group
 from rest_framework.authtoken.models import TokenProxy
 from shortener.admin import UrlMap, UrlProfile
 
+from foodgram_backend.paginators import EstimatedCountPaginator
 from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingList, Tag, )
+                     ShoppingCartItem, ShoppingList, Tag, )
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredients', )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('recipes',
+                                                            'ingredients')
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline, )
     list_display = ('name', 'author', 'cooking_time', 'in_favorite_count', )
+    list_select_related = ('author', )
     search_fields = ('author__email', 'name', )
     list_filter = ('tags', )
-
-    @admin.display(description='Количество добавления в избранное')
+    autocomplete_fields = ('author', )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change:
+            ShoppingCartItem.objects.rebuild(
+                form.instance.shopping.values_list('user_id', flat=True))
+
+    @admin.display(description='Количество добавления в избранное',
+                   ordering='favorites_count')
     def in_favorite_count(self, recipe):
-        return recipe.favorites.count()
+        return recipe.favorites_count
 
 
 @admin.register(Ingredient)
@@ -36,14 +53,22 @@ class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug', )
 
 
-@admin.register(FavoriteRecipe)
-class FavoriteRecipeAdmin(admin.ModelAdmin):
+class UserRecipeAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe', )
+    list_select_related = ('user', 'recipe', )
+    autocomplete_fields = ('user', 'recipe', )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(FavoriteRecipe)
+class FavoriteRecipeAdmin(UserRecipeAdmin):
+    pass
 
 
 @admin.register(ShoppingList)
-class ShoppingListAdmin(admin.ModelAdmin):
-    list_display = ('user', 'recipe', )
+class ShoppingListAdmin(UserRecipeAdmin):
+    pass
 
 
 admin.site.unregister(Group)
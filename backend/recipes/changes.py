@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from foodgram_backend import caches
+from foodgram_backend.constants import (RECIPE_CHANGES_LIMIT,
+                                        RECIPE_CHANGES_TIMEOUT)
+from .models import Recipe
+
+VERSION_KEY = 'recipe-changes-version'
+CHANGES_KEY = 'recipe-changes:{version}'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 0, timeout=None)
+        version = cache.get(VERSION_KEY, 0)
+    if not caches.is_shared():
+        state = Recipe.objects.aggregate(Max('updated_at'), Count('pk'))
+        version = (version, state['updated_at__max'], state['pk__count'])
+    return version
+
+
+def publish(pks):
+    cache.add(VERSION_KEY, 0, timeout=None)
+    version = cache.incr(VERSION_KEY)
+    cache.set(CHANGES_KEY.format(version=version), pks,
+              RECIPE_CHANGES_TIMEOUT)
+
+
+def changed_since(version, current):
+    if (version is None or not caches.is_shared()
+            or not 0 < current - version <= RECIPE_CHANGES_LIMIT):
+        return None
+    keys = [CHANGES_KEY.format(version=number)
+            for number in range(version + 1, current + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return set().union(*changes.values())
+
+
+class PendingChanges:
+    def __init__(self):
+        self.pks = set()
+
+    def __call__(self):
+        publish(self.pks)
+
+
+def record(pks):
+    pks = set(pks)
+    if not pks:
+        return
+    connection = transaction.get_connection()
+    pending = next((callback for _, callback in connection.run_on_commit
+                    if isinstance(callback, PendingChanges)), None)
+    if pending is not None:
+        pending.pks.update(pks)
+        return
+    pending = PendingChanges()
+    pending.pks.update(pks)
+    transaction.on_commit(pending)
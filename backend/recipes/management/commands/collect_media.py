@@ -0,0 +1,96 @@
+import os
+from collections import Counter
+from time import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+
+from foodgram_backend.images import variants_field
+
+REFERENCE_CHUNK_SIZE = 2000
+
+
+def file_fields():
+    for model in apps.get_models():
+        field_names = {field.name for field in model._meta.concrete_fields}
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                variants = variants_field(field.name)
+                yield model, field.name, (variants if variants in field_names
+                                          else None)
+
+
+def count_references():
+    references = Counter()
+    for model, field_name, variants in file_fields():
+        queryset = model._default_manager.exclude(
+            **{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        columns = (field_name, variants) if variants else (field_name, )
+        for row in queryset.values_list(*columns).iterator(
+                chunk_size=REFERENCE_CHUNK_SIZE):
+            references[row[0]] += 1
+            if variants and row[1]:
+                references.update(name for variant, name in row[1].items()
+                                  if variant != 'source')
+    return references
+
+
+class Command(BaseCommand):
+    help = 'Delete media files that are no longer referenced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--min-age', type=int,
+                            default=settings.MEDIA_GC_MIN_AGE,
+                            help='Keep unreferenced files younger than this '
+                                 'many seconds')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted')
+
+    def _delete(self, names, min_age, dry_run):
+        deleted = 0
+        for name in names:
+            path = default_storage.path(name)
+            try:
+                if time() - os.stat(path).st_mtime < min_age:
+                    continue
+                if dry_run:
+                    self.stdout.write(f'- {name}')
+                else:
+                    default_storage.delete(name)
+            except FileNotFoundError:
+                continue
+            deleted += 1
+        return deleted
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'walk'):
+            raise CommandError('The default storage cannot be listed')
+        references = count_references()
+        stats = dict.fromkeys(('scanned', 'referenced', 'young', 'deleted'),
+                              0)
+        if os.path.isdir(default_storage.location):
+            batch, now = [], time()
+            for name, modified in default_storage.walk():
+                stats['scanned'] += 1
+                if name in references:
+                    stats['referenced'] += 1
+                elif now - modified < options['min_age']:
+                    stats['young'] += 1
+                else:
+                    batch.append(name)
+                if len(batch) >= options['batch_size']:
+                    stats['deleted'] += self._delete(
+                        batch, options['min_age'], options['dry_run'])
+                    batch = []
+            stats['deleted'] += self._delete(batch, options['min_age'],
+                                             options['dry_run'])
+        shared = sum(1 for count in references.values() if count > 1)
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {stats["deleted"]} of {stats["scanned"]} files '
+            f'({stats["referenced"]} referenced, {shared} shared, '
+            f'{stats["young"]} too recent to collect)'))
@@ -0,0 +1,65 @@
+from collections import defaultdict
+from datetime import timedelta
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from foodgram_backend.constants import (POPULAR_HALF_LIFE,
+                                        RANKING_BATCH_SIZE,
+                                        RANKING_FAVORITE_WEIGHT,
+                                        RANKING_SHOPPING_WEIGHT,
+                                        TRENDING_HALF_LIFE, TRENDING_WINDOW)
+from recipes.models import FavoriteRecipe, Recipe, RecipeRanking, ShoppingList
+
+SOURCES = ((FavoriteRecipe, RANKING_FAVORITE_WEIGHT),
+           (ShoppingList, RANKING_SHOPPING_WEIGHT))
+
+
+def add_decayed(scores, events, now, half_life, weight):
+    for recipe_id, bucket, count in events.iterator():
+        age = max((now - bucket).total_seconds(), 0)
+        scores[recipe_id] += weight * count * 0.5 ** (age / half_life)
+
+
+def bucketed(model, trunc, since=None):
+    events = model.objects.all()
+    if since is not None:
+        events = events.filter(created_at__gte=since)
+    return events.annotate(bucket=trunc('created_at')).values(
+        'recipe', 'bucket').annotate(count=Count('pk')).values_list(
+        'recipe', 'bucket', 'count').order_by()
+
+
+class Command(BaseCommand):
+    help = 'Recompute the popular and trending recipe rankings'
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        now = timezone.now()
+        popular, trending = defaultdict(float), defaultdict(float)
+        for model, weight in SOURCES:
+            add_decayed(popular, bucketed(model, TruncDay), now,
+                        POPULAR_HALF_LIFE, weight)
+            add_decayed(trending,
+                        bucketed(model, TruncHour,
+                                 now - timedelta(seconds=TRENDING_WINDOW)),
+                        now, TRENDING_HALF_LIFE, weight)
+        recipe_ids = sorted(set(popular).union(trending))
+        created = 0
+        with transaction.atomic():
+            RecipeRanking.objects.all().delete()
+            for start in range(0, len(recipe_ids), RANKING_BATCH_SIZE):
+                batch = Recipe.objects.filter(
+                    pk__in=recipe_ids[start:start + RANKING_BATCH_SIZE]
+                ).values_list('pk', flat=True)
+                created += len(RecipeRanking.objects.bulk_create(
+                    RecipeRanking(recipe_id=pk, popular=popular[pk],
+                                  trending=trending.get(pk, 0),
+                                  computed_at=now)
+                    for pk in batch))
+        self.stdout.write(self.style.SUCCESS(
+            f'Ranked {created} recipes in {perf_counter() - started:.2f}s'))
@@ -0,0 +1,116 @@
+from itertools import chain
+from time import perf_counter
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from foodgram_backend.constants import (SIMILAR_BATCH_SIZE,
+                                        SIMILAR_MAX_FEATURE_SHARE,
+                                        SIMILAR_RECIPES_COUNT,
+                                        SIMILAR_STOP_FEATURES_MIN_RECIPES,
+                                        SIMILAR_TAG_WEIGHT)
+from recipes import similarity
+from recipes.models import Recipe, RecipeIngredient, RecipeNeighbour
+
+
+def load_ids(queryset, columns=1, dtype=np.int64):
+    ids = np.fromiter(chain.from_iterable(queryset.order_by().iterator())
+                      if columns > 1 else queryset.order_by().iterator(),
+                      dtype=dtype)
+    return ids.reshape(-1, columns).T if columns > 1 else ids
+
+
+def feature_matrix(pks):
+    rows, columns, weights = [], [], []
+    sources = (
+        (RecipeIngredient.objects.values_list('recipes', 'ingredients'), 1),
+        (Recipe.tags.through.objects.values_list('recipe', 'tag'),
+         SIMILAR_TAG_WEIGHT))
+    for queryset, weight in sources:
+        recipe_ids, feature_ids = load_ids(queryset, 2)
+        known = np.isin(recipe_ids, pks)
+        features, feature_columns = np.unique(feature_ids[known],
+                                              return_inverse=True)
+        rows.append(np.searchsorted(pks, recipe_ids[known]))
+        columns.append(feature_columns + sum(map(len, weights)))
+        weights.append(np.full(len(features), weight, dtype=np.float32))
+    max_share = (SIMILAR_MAX_FEATURE_SHARE
+                 if len(pks) >= SIMILAR_STOP_FEATURES_MIN_RECIPES else None)
+    return similarity.feature_matrix(
+        np.concatenate(rows), np.concatenate(columns), len(pks),
+        np.concatenate(weights), max_share)
+
+
+def positions(pks, ids):
+    return np.searchsorted(pks, ids[np.isin(ids, pks)])
+
+
+def affected_rows(matrix, pks, since, top_k):
+    edited = positions(pks, load_ids(Recipe.objects.filter(
+        updated_at__gt=since).values_list('pk', flat=True)))
+    best = similarity.best_scores(matrix, edited)
+    recipe_ids, worst, count, last_rank = load_ids(
+        RecipeNeighbour.objects.values('recipe').annotate(
+            worst=Min('score'), count=Count('pk'),
+            last_rank=Max('rank')).values_list(
+            'recipe', 'worst', 'count', 'last_rank'), 4, np.float64)
+    recipe_ids = recipe_ids.astype(np.int64)
+    stored = np.isin(recipe_ids, pks)
+    threshold = np.zeros(len(pks))
+    threshold[positions(pks, recipe_ids)] = np.where(
+        count[stored] < top_k, 0, worst[stored])
+    affected = (best > 0) & (best >= threshold)
+    affected[positions(pks, recipe_ids[stored & (count <= last_rank)])] = True
+    affected[positions(pks, load_ids(RecipeNeighbour.objects.filter(
+        neighbour__updated_at__gt=since).values_list(
+        'recipe', flat=True)))] = True
+    return np.flatnonzero(affected)
+
+
+class Command(BaseCommand):
+    help = 'Recompute similar recipes from ingredient and tag overlap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every recipe, not only changes')
+        parser.add_argument('--top-k', type=int,
+                            default=SIMILAR_RECIPES_COUNT)
+        parser.add_argument('--batch-size', type=int,
+                            default=SIMILAR_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1)
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        now = timezone.now()
+        since = RecipeNeighbour.objects.aggregate(
+            Max('computed_at'))['computed_at__max']
+        pks = load_ids(Recipe.objects.values_list('pk', flat=True))
+        pks.sort()
+        matrix = feature_matrix(pks)
+        if options['full'] or since is None:
+            sources = np.arange(len(pks))
+        else:
+            sources = affected_rows(matrix, pks, since, options['top_k'])
+        if options['workers'] > 1:
+            connections.close_all()
+        stored = 0
+        for batch, rows, columns, scores, ranks in similarity.nearest(
+                matrix, sources, options['top_k'], options['batch_size'],
+                options['workers']):
+            with transaction.atomic():
+                RecipeNeighbour.objects.filter(
+                    recipe__in=pks[batch].tolist()).delete()
+                stored += len(RecipeNeighbour.objects.bulk_create(
+                    RecipeNeighbour(recipe_id=recipe_id,
+                                    neighbour_id=neighbour_id, score=score,
+                                    rank=rank, computed_at=now)
+                    for recipe_id, neighbour_id, score, rank in zip(
+                        pks[rows].tolist(), pks[columns].tolist(),
+                        scores.tolist(), ranks.tolist())))
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} neighbours for {len(sources)} of {len(pks)} '
+            f'recipes ({matrix.shape[1]} features) '
+            f'in {perf_counter() - started:.2f}s'))
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from foodgram_backend.images import generate_in_thread, variants_field
+from recipes.models import Recipe
+
+User = get_user_model()
+
+IMAGE_FIELDS = ((Recipe, 'image'), (User, 'avatar'))
+
+
+class Command(BaseCommand):
+    help = 'Generate missing resized variants for recipe images and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate variants that already exist')
+        parser.add_argument('--workers', type=int,
+                            default=settings.IMAGE_VARIANT_WORKERS)
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for model, field_name in IMAGE_FIELDS:
+                rows = model.objects.exclude(**{field_name: ''}).exclude(
+                    **{f'{field_name}__isnull': True}).values_list(
+                    'pk', field_name, variants_field(field_name))
+                jobs = [executor.submit(generate_in_thread, model, pk,
+                                        field_name, name)
+                        for pk, name, variants in rows.iterator()
+                        if options['force']
+                        or variants.get('source') != name]
+                failed = sum(job.result() is None for job in jobs)
+                self.stdout.write(
+                    f'{model._meta.label}.{field_name}: '
+                    f'{len(jobs) - failed} generated, {failed} failed')
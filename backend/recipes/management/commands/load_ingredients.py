@@ -1,24 +1,160 @@
 import csv
+import json
 import os
+from itertools import islice
+from time import perf_counter
 
-from django.core.management.base import BaseCommand
-from recipes.models import Ingredient
 from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import reference
+from foodgram_backend.constants import (INGREDIENT_NAME_LENGTH,
+                                        INGREDIENT_UNIT_LENGTH)
+from recipes.models import Ingredient
+
+FORMATS = ('csv', 'json', 'jsonl')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def ingredient_fields(item):
+    if isinstance(item, dict):
+        return item.get('name', ''), item.get('measurement_unit', '')
+    return (list(item) + ['', ''])[:2]
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if not row:
+            continue
+        yield (row + [''])[:2]
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield ingredient_fields(json.loads(line))
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer, position, started = '', 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError('Expected a JSON array of ingredients')
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                if buffer[position:].strip():
+                    raise
+                return
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        position = end
+        yield ingredient_fields(item)
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'jsonl': read_jsonl}
+
+
+def detect_format(path, file):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension in FORMATS:
+        return extension
+    head = file.read(READ_CHUNK_SIZE).lstrip()
+    file.seek(0)
+    if head.startswith('['):
+        return 'json'
+    if head.startswith('{'):
+        return 'jsonl'
+    return 'csv'
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
 
 class Command(BaseCommand):
     help = 'Load ingredients into the database'
 
-    def handle(self, *args, **kwargs):
-        file_path = os.path.join(settings.BASE_DIR, 'data',
-                                 'ingredients.csv')
-        if not os.path.exists(file_path):
-            return
-        with open(file_path, mode='r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                name, measurement_unit = row
-                Ingredient.objects.get_or_create(
-                    name=name.strip(),
-                    measurement_unit=measurement_unit.strip()
-                )
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'))
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be created and exit')
+
+    def _new_ingredients(self, rows, stats):
+        seen = set(Ingredient.objects.values_list('name', 'measurement_unit'))
+        stats['existing'] = len(seen)
+        for number, (name, measurement_unit) in enumerate(rows, 1):
+            stats['read'] += 1
+            key = (str(name).strip(), str(measurement_unit).strip())
+            if (not all(key) or len(key[0]) > INGREDIENT_NAME_LENGTH
+                    or len(key[1]) > INGREDIENT_UNIT_LENGTH):
+                stats['invalid'] += 1
+                self.stderr.write(f'Skipping row {number}: {key}')
+                continue
+            if key in seen:
+                stats['skipped'] += 1
+                continue
+            seen.add(key)
+            yield key
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File {path} does not exist')
+        stats = dict.fromkeys(('read', 'existing', 'skipped', 'invalid',
+                               'created'), 0)
+        started = perf_counter()
+        with open(path, encoding='utf-8', newline='') as file:
+            file_format = options['format'] or detect_format(path, file)
+            new = self._new_ingredients(READERS[file_format](file), stats)
+            try:
+                with transaction.atomic():
+                    for batch in batches(new, options['batch_size']):
+                        stats['created'] += len(batch)
+                        if options['dry_run']:
+                            for name, measurement_unit in batch:
+                                self.stdout.write(
+                                    f'+ {name} ({measurement_unit})',
+                                    self.style.SUCCESS)
+                            continue
+                        Ingredient.objects.bulk_create(
+                            (Ingredient(name=name,
+                                        measurement_unit=measurement_unit)
+                             for name, measurement_unit in batch),
+                            ignore_conflicts=True)
+            except ValueError as error:
+                raise CommandError(f'Cannot parse {path}: {error}')
+        elapsed = perf_counter() - started
+        if stats['created'] and not options['dry_run']:
+            reference.ingredients.invalidate()
+        action = 'Would create' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {stats["created"]} ingredients from '
+            f'{stats["read"]} {file_format} rows '
+            f'({stats["skipped"]} already present, '
+            f'{stats["invalid"]} invalid, '
+            f'{stats["existing"]} in the database before) '
+            f'in {elapsed:.2f}s, '
+            f'{stats["read"] / elapsed if elapsed else 0:.0f} rows/s'))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram_backend.constants import SHOPPING_CART_BATCH_SIZE
+from recipes.models import ShoppingCartItem, ShoppingList
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the per-user shopping cart totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='+', dest='users')
+        parser.add_argument('--verify', action='store_true',
+                            help='Only compare stored totals with the live '
+                                 'join, exit with an error on mismatch')
+
+    def _user_batches(self, users):
+        if users is None:
+            users = set(ShoppingList.objects.values_list('user_id',
+                                                         flat=True))
+            users.update(ShoppingCartItem.objects.values_list('user_id',
+                                                              flat=True))
+            users = sorted(users)
+        for start in range(0, len(users), SHOPPING_CART_BATCH_SIZE):
+            yield users[start:start + SHOPPING_CART_BATCH_SIZE]
+
+    @staticmethod
+    def _mismatches(user_ids):
+        live = {(user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount
+                in ShoppingCartItem.objects.live_totals(user_ids)}
+        stored = {(user_id, ingredient_id): amount
+                  for user_id, ingredient_id, amount
+                  in ShoppingCartItem.objects.filter(
+                      user__in=user_ids).values_list(
+                      'user_id', 'ingredient_id', 'amount')}
+        return [(key, stored.get(key), live.get(key))
+                for key in sorted(set(live).union(stored))
+                if stored.get(key) != live.get(key)]
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if not options['verify']:
+            created = sum(ShoppingCartItem.objects.rebuild(batch)
+                          for batch in self._user_batches(users))
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {created} shopping cart items'))
+            return
+        mismatches = []
+        for batch in self._user_batches(users):
+            mismatches.extend(self._mismatches(batch))
+        for (user_id, ingredient_id), stored, live in mismatches:
+            self.stdout.write(f'user={user_id} ingredient={ingredient_id} '
+                              f'stored={stored} live={live}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} shopping cart items '
+                               f'differ from the live totals')
+        self.stdout.write(self.style.SUCCESS('Shopping cart totals match'))
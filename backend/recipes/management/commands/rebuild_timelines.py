@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import TimelineEntry
+from users.models import Subscribe
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the subscription feed timelines from subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='+', dest='users')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        entries = TimelineEntry.objects.all()
+        subscriptions = Subscribe.objects.order_by('user', 'subscriber')
+        if options['users'] is not None:
+            entries = entries.filter(user__in=options['users'])
+            subscriptions = subscriptions.filter(
+                subscriber__in=options['users'])
+        entries.delete()
+        for subscriber_id, author_id in subscriptions.values_list(
+                'subscriber', 'user').iterator():
+            TimelineEntry.objects.backfill(subscriber_id, author_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt timelines with {entries.count()} entries'))
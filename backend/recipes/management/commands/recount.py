@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from foodgram_backend.counters import count_related
+from recipes.models import FavoriteRecipe, Recipe
+from users.models import Subscribe
+
+User = get_user_model()
+
+COUNTERS = ((Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+            (User, 'recipes_count', Recipe, 'author'),
+            (User, 'subscribers_count', Subscribe, 'user'))
+
+
+class Command(BaseCommand):
+    help = 'Detect and repair drift in the denormalized counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift, exit with an error '
+                                 'if any counter is wrong')
+
+    def handle(self, *args, **options):
+        drifted_total = 0
+        for model, field, related, lookup in COUNTERS:
+            actual = count_related(related, lookup)
+            with transaction.atomic():
+                drifted = model.objects.annotate(actual=actual).exclude(
+                    **{field: F('actual')}).values('pk')
+                drifted_count = drifted.count()
+                if drifted_count and not options['check']:
+                    model.objects.filter(pk__in=drifted).update(
+                        **{field: actual})
+            drifted_total += drifted_count
+            self.stdout.write(f'{model._meta.label}.{field}: '
+                              f'{drifted_count} drifted')
+        if not drifted_total:
+            self.stdout.write(self.style.SUCCESS('Counters are consistent'))
+        elif options['check']:
+            raise CommandError(f'{drifted_total} counters have drifted')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired {drifted_total} counters'))
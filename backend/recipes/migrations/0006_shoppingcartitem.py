@@ -0,0 +1,51 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_shopping_cart_items(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingCartItem = apps.get_model('recipes', 'ShoppingCartItem')
+    totals = RecipeIngredient.objects.filter(
+        recipes__shopping__isnull=False
+    ).values_list('recipes__shopping__user', 'ingredients').annotate(
+        total=Sum('amount')).order_by()
+    ShoppingCartItem.objects.bulk_create(
+        (ShoppingCartItem(user_id=user_id, ingredient_id=ingredient_id,
+                          amount=amount)
+         for user_id, ingredient_id, amount in totals.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_items', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'ингредиент из списка',
+                'verbose_name_plural': 'Ингредиенты из списка',
+                'default_related_name': 'shopping_cart_items',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_cart_item'),
+        ),
+        migrations.RunPython(fill_shopping_cart_items,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:42
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_favorites(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FavoriteRecipe = apps.get_model('recipes', 'FavoriteRecipe')
+    favorites = FavoriteRecipe.objects.filter(
+        recipe=OuterRef('pk')).order_by().values('recipe').annotate(
+        total=Count('pk')).values('total')
+    Recipe.objects.update(favorites_count=Coalesce(
+        Subquery(favorites, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppingcartitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.RunPython(count_favorites, migrations.RunPython.noop),
+    ]
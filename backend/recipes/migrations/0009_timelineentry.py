@@ -0,0 +1,67 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 100
+
+
+def fill_timelines(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscribe = apps.get_model('users', 'Subscribe')
+    TimelineEntry = apps.get_model('recipes', 'TimelineEntry')
+    subscriptions = Subscribe.objects.filter(
+        user__subscribers_count__lte=FEED_FANOUT_LIMIT).values_list(
+        'user', 'subscriber').order_by('user')
+    latest = {}
+    entries = []
+    for author_id, subscriber_id in subscriptions.iterator():
+        if author_id not in latest:
+            latest = {author_id: list(Recipe.objects.filter(
+                author=author_id).order_by('-created_at', '-id').values_list(
+                'pk', 'created_at')[:FEED_BACKFILL_LIMIT])}
+        entries.extend(
+            TimelineEntry(user_id=subscriber_id, recipe_id=recipe_id,
+                          created_at=created_at)
+            for recipe_id, created_at in latest[author_id])
+        if len(entries) >= 1000:
+            TimelineEntry.objects.bulk_create(entries)
+            entries = []
+    TimelineEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_recipe_image_variants'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Время добавления рецепта')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'default_related_name': 'timeline_entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-created_at', '-recipe'], name='timeline_user_created_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:58
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+FILL_SEARCH_VECTOR = '''
+UPDATE recipes_recipe SET search_vector =
+    setweight(to_tsvector('russian', recipes_recipe.name), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS link
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = link.ingredients_id
+        WHERE link.recipes_id = recipes_recipe.id), '')), 'B')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(tag.name, ' ')
+        FROM recipes_recipe_tags AS link
+        JOIN recipes_tag AS tag ON tag.id = link.tag_id
+        WHERE link.recipe_id = recipes_recipe.id), '')), 'B')
+    || setweight(to_tsvector('russian', recipes_recipe.text), 'C')
+'''
+
+
+class AddPostgreSQLIndex(migrations.AddIndex):
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state,
+                                      to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state,
+                                       to_state)
+
+
+def fill_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(FILL_SEARCH_VECTOR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый документ'),
+        ),
+        AddPostgreSQLIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
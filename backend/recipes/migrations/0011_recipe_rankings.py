@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popular', models.FloatField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Тренд')),
+                ('computed_at', models.DateTimeField(verbose_name='Время расчёта')),
+            ],
+            options={
+                'verbose_name': 'рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favoriterecipe',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Время добавления'),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Время добавления'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-popular', '-recipe'], name='ranking_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-trending', '-recipe'], name='ranking_trending_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('computed_at', models.DateTimeField(db_index=True, verbose_name='Время расчёта')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='recipes.recipe', verbose_name='Похожий рецепт')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeneighbour',
+            constraint=models.UniqueConstraint(fields=('recipe', 'rank'), name='unique_recipe_neighbour_rank'),
+        ),
+    ]
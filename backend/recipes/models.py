@@ -1,15 +1,26 @@
 from datetime import datetime
+from itertools import chain
 
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, transaction
+from django.db.models import (Case, F, IntegerField, Q, Sum,
+                              UniqueConstraint, Value, When, Window)
+from django.db.models.functions import Greatest, RowNumber
+from django.utils import timezone
 
-from foodgram_backend.constants import (INGREDIENT_NAME_LENGTH,
+from foodgram_backend.constants import (FEED_BACKFILL_LIMIT,
+                                        FEED_FANOUT_BATCH_SIZE,
+                                        FEED_FANOUT_LIMIT,
+                                        INGREDIENT_NAME_LENGTH,
                                         INGREDIENT_UNIT_LENGTH,
                                         MIN_VALUE_ERROR,
                                         RECIPE_NAME_LENGTH, RECIPE_TEXT_LENGTH,
+                                        SHOPPING_CART_BATCH_SIZE,
                                         TAG_NAME_LENGTH, TAG_SLUG_LENGTH, )
+from users.models import Subscribe
 
 
 User = get_user_model()
@@ -49,6 +60,24 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def touch(self):
+        return self.update(updated_at=timezone.now())
+
+    def latest_per_author(self, author_ids, limit=None):
+        recipes = self.filter(author__in=author_ids)
+        if limit is None:
+            return list(recipes)
+        ranked = recipes.annotate(row_number=Window(
+            RowNumber(),
+            partition_by=F('author'),
+            order_by=(F('created_at').desc(), F('id').desc())))
+        return list(recipes.filter(pk__in=[
+            pk for pk, row_number
+            in ranked.order_by().values_list('pk', 'row_number')
+            if row_number <= limit]))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
@@ -62,6 +91,10 @@ class Recipe(models.Model):
                                          verbose_name='Ингредиенты')
     image = models.ImageField('Изображение',
                               upload_to='recipes/')
+    image_variants = models.JSONField('Варианты изображения',
+                                      default=dict,
+                                      blank=True,
+                                      editable=False)
     text = models.TextField('Описание',
                             max_length=RECIPE_TEXT_LENGTH)
     cooking_time = models.PositiveIntegerField(
@@ -69,11 +102,26 @@ class Recipe(models.Model):
         validators=[MinValueValidator(1, message=MIN_VALUE_ERROR)]
     )
     created_at = models.DateTimeField('Время добавления', default=datetime.now)
+    updated_at = models.DateTimeField('Время изменения',
+                                      auto_now=True,
+                                      db_index=True)
+    favorites_count = models.PositiveIntegerField('Добавлений в избранное',
+                                                  default=0,
+                                                  editable=False)
+    search_vector = SearchVectorField('Поисковый документ',
+                                      null=True,
+                                      editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-created_at',)
+        ordering = ('-created_at', '-id', )
+        indexes = (models.Index(fields=('-created_at', '-id', ),
+                                name='recipe_created_at_id_idx'),
+                   GinIndex(fields=('search_vector', ),
+                            name='recipe_search_vector_idx'), )
 
     def __str__(self) -> str:
         return self.name
@@ -110,6 +158,9 @@ class UserRecipeBase(models.Model):
     recipe = models.ForeignKey(Recipe,
                                on_delete=models.CASCADE,
                                verbose_name='Рецепт')
+    created_at = models.DateTimeField('Время добавления',
+                                      default=timezone.now,
+                                      db_index=True)
 
     class Meta:
         abstract = True
@@ -139,3 +190,210 @@ class ShoppingList(UserRecipeBase):
 
     def __str__(self) -> str:
         return f'У пользователя {self.user} в списке рецепт {self.recipe.name}'
+
+
+class ShoppingCartItemQuerySet(models.QuerySet):
+    def _apply(self, user_id, recipe_id, sign):
+        amounts = dict(RecipeIngredient.objects.filter(
+            recipes_id=recipe_id).values_list('ingredients_id', 'amount'))
+        if not amounts:
+            return
+        self.bulk_create((self.model(user_id=user_id,
+                                     ingredient_id=ingredient_id,
+                                     amount=0)
+                          for ingredient_id in amounts),
+                         ignore_conflicts=True)
+        items = self.filter(user_id=user_id, ingredient_id__in=amounts)
+        delta = Case(*(When(ingredient_id=ingredient_id,
+                            then=Value(sign * amount))
+                       for ingredient_id, amount in amounts.items()),
+                     output_field=IntegerField())
+        items.update(amount=Greatest(F('amount') + delta, Value(0)))
+        items.filter(amount=0).delete()
+
+    def add_recipe(self, user_id, recipe_id):
+        self._apply(user_id, recipe_id, 1)
+
+    def remove_recipe(self, user_id, recipe_id):
+        self._apply(user_id, recipe_id, -1)
+
+    @staticmethod
+    def live_totals(user_ids=None):
+        rows = RecipeIngredient.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(recipes__shopping__user__in=user_ids)
+        else:
+            rows = rows.filter(recipes__shopping__isnull=False)
+        return rows.values_list(
+            'recipes__shopping__user', 'ingredients'
+        ).annotate(total=Sum('amount')).order_by()
+
+    @transaction.atomic
+    def rebuild(self, user_ids=None):
+        items = self.all()
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            items = items.filter(user__in=user_ids)
+        items.delete()
+        return len(self.bulk_create(
+            (self.model(user_id=user_id, ingredient_id=ingredient_id,
+                        amount=amount)
+             for user_id, ingredient_id, amount
+             in self.live_totals(user_ids)),
+            batch_size=SHOPPING_CART_BATCH_SIZE))
+
+
+class ShoppingCartItem(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             verbose_name='Пользователь')
+    ingredient = models.ForeignKey(Ingredient,
+                                   on_delete=models.CASCADE,
+                                   verbose_name='Ингредиент')
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingCartItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ингредиент из списка'
+        verbose_name_plural = 'Ингредиенты из списка'
+        default_related_name = 'shopping_cart_items'
+        constraints = (UniqueConstraint(fields=['user', 'ingredient'],
+                                        name='unique_shopping_cart_item'), )
+
+    def __str__(self) -> str:
+        return (f'У пользователя {self.user} в списке '
+                f'{self.ingredient.name} в кол-ве {self.amount}')
+
+
+class TimelineEntryQuerySet(models.QuerySet):
+    @staticmethod
+    def fans_out(author_id):
+        return User.objects.filter(
+            pk=author_id, subscribers_count__lte=FEED_FANOUT_LIMIT).exists()
+
+    def fan_out(self, recipe):
+        if not self.fans_out(recipe.author_id):
+            return
+        followers = Subscribe.objects.filter(
+            user=recipe.author_id).values_list('subscriber', flat=True)
+        self.bulk_create(
+            (self.model(user_id=follower, recipe_id=recipe.pk,
+                        created_at=recipe.created_at)
+             for follower in followers.iterator()),
+            batch_size=FEED_FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+    def backfill(self, user_id, author_id):
+        if not self.fans_out(author_id):
+            return
+        recipes = Recipe.objects.filter(author=author_id).values_list(
+            'pk', 'created_at')[:FEED_BACKFILL_LIMIT]
+        self.bulk_create(
+            (self.model(user_id=user_id, recipe_id=recipe_id,
+                        created_at=created_at)
+             for recipe_id, created_at in recipes),
+            ignore_conflicts=True)
+
+    def backfill_author(self, author_id):
+        followers = Subscribe.objects.filter(user=author_id).values_list(
+            'subscriber', flat=True)
+        recipes = list(Recipe.objects.filter(author=author_id).values_list(
+            'pk', 'created_at')[:FEED_BACKFILL_LIMIT])
+        self.bulk_create(
+            (self.model(user_id=follower, recipe_id=recipe_id,
+                        created_at=created_at)
+             for follower in followers.iterator()
+             for recipe_id, created_at in recipes),
+            batch_size=FEED_FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+    def prune(self, user_id, author_id):
+        return self.filter(user=user_id, recipe__author=author_id).delete()
+
+    def prune_author(self, author_id):
+        return self.filter(recipe__author=author_id).delete()
+
+    def feed(self, user, position=None, limit=None):
+        timeline = self.filter(user=user).values_list(
+            'created_at', 'recipe_id').order_by('-created_at', '-recipe_id')
+        pulled = Recipe.objects.filter(
+            author__following__subscriber=user,
+            author__subscribers_count__gt=FEED_FANOUT_LIMIT).values_list(
+            'created_at', 'pk').order_by('-created_at', '-pk')
+        if position is not None:
+            created_at, pk = position
+            timeline = timeline.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(recipe_id__lt=pk))
+            pulled = pulled.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(pk__lt=pk))
+        if limit is not None:
+            timeline, pulled = timeline[:limit], pulled[:limit]
+        return sorted(set(chain(timeline, pulled)), reverse=True)[:limit]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             verbose_name='Подписчик')
+    recipe = models.ForeignKey(Recipe,
+                               on_delete=models.CASCADE,
+                               verbose_name='Рецепт')
+    created_at = models.DateTimeField('Время добавления рецепта')
+
+    objects = TimelineEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        default_related_name = 'timeline_entries'
+        constraints = (UniqueConstraint(fields=['user', 'recipe'],
+                                        name='unique_timeline_entry'), )
+        indexes = (models.Index(fields=('user', '-created_at', '-recipe'),
+                                name='timeline_user_created_at_idx'), )
+
+    def __str__(self) -> str:
+        return f'В ленте пользователя {self.user} рецепт {self.recipe.name}'
+
+
+class RecipeRanking(models.Model):
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='ranking',
+                                  verbose_name='Рецепт')
+    popular = models.FloatField('Популярность', default=0)
+    trending = models.FloatField('Тренд', default=0)
+    computed_at = models.DateTimeField('Время расчёта')
+
+    class Meta:
+        verbose_name = 'рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (models.Index(fields=('-popular', '-recipe'),
+                                name='ranking_popular_idx'),
+                   models.Index(fields=('-trending', '-recipe'),
+                                name='ranking_trending_idx'))
+
+    def __str__(self) -> str:
+        return f'Рейтинг рецепта {self.recipe.name}'
+
+
+class RecipeNeighbour(models.Model):
+    recipe = models.ForeignKey(Recipe,
+                               on_delete=models.CASCADE,
+                               related_name='neighbours',
+                               verbose_name='Рецепт')
+    neighbour = models.ForeignKey(Recipe,
+                                  on_delete=models.CASCADE,
+                                  related_name='neighbour_of',
+                                  verbose_name='Похожий рецепт')
+    score = models.FloatField('Сходство')
+    rank = models.PositiveSmallIntegerField('Место')
+    computed_at = models.DateTimeField('Время расчёта', db_index=True)
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (models.UniqueConstraint(
+            fields=('recipe', 'rank'), name='unique_recipe_neighbour_rank'), )
+
+    def __str__(self) -> str:
+        return f'{self.neighbour.name} похож на {self.recipe.name}'
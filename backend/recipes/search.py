@@ -0,0 +1,177 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, transaction
+from django.db.models import (Case, F, FloatField, OuterRef, Subquery,
+                              TextField, Value, When)
+from django.db.models.functions import Coalesce
+
+from foodgram_backend.constants import (RECIPE_SEARCH_CONFIG,
+                                        RECIPE_SEARCH_WEIGHTS)
+from . import changes
+from .models import Recipe, RecipeIngredient
+
+WORD_RE = re.compile(r'\w+')
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией',
+    'ться', 'ешь', 'ишь', 'ете', 'ите', 'ает', 'яет', 'ует', 'ют',
+    'ут', 'ат', 'ят', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой',
+    'ей', 'ую', 'юю', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев', 'ью',
+    'ия', 'ии', 'ть', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+
+def is_postgresql(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def stem(word):
+    for ending in ENDINGS:
+        if (word.endswith(ending)
+                and len(word) - len(ending) >= MIN_STEM_LENGTH):
+            return word[:-len(ending)]
+    return word
+
+
+def terms(text):
+    return [stem(word) for word in
+            WORD_RE.findall(text.lower().replace('ё', 'е'))]
+
+
+def document_vector():
+    ingredients = RecipeIngredient.objects.filter(
+        recipes=OuterRef('pk')).order_by().values('recipes').annotate(
+        names=StringAgg('ingredients__name', ' ')).values('names')
+    tags = Recipe.tags.through.objects.filter(
+        recipe=OuterRef('pk')).order_by().values('recipe').annotate(
+        names=StringAgg('tag__name', ' ')).values('names')
+    return (
+        SearchVector('name', weight='A', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector(Coalesce(Subquery(ingredients), Value(''),
+                                output_field=TextField()),
+                       weight='B', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector(Coalesce(Subquery(tags), Value(''),
+                                output_field=TextField()),
+                       weight='B', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=RECIPE_SEARCH_CONFIG))
+
+
+def reindex(pks=None):
+    recipes = Recipe.objects.all()
+    if pks is not None:
+        recipes = recipes.filter(pk__in=pks)
+    return recipes.update(search_vector=document_vector())
+
+
+class PendingReindex:
+    def __init__(self):
+        self.pks = set()
+
+    def __call__(self):
+        reindex(self.pks)
+
+
+def schedule_reindex(pks):
+    if not is_postgresql():
+        return
+    pks = set(pks)
+    if not pks:
+        return
+    connection = transaction.get_connection()
+    pending = next((callback for _, callback in connection.run_on_commit
+                    if isinstance(callback, PendingReindex)), None)
+    if pending is not None:
+        pending.pks.update(pks)
+        return
+    pending = PendingReindex()
+    pending.pks.update(pks)
+    transaction.on_commit(pending)
+
+
+class RecipeSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+        self._postings = defaultdict(dict)
+        self._documents = {}
+
+    def _load(self, recipes):
+        pks = list(recipes.values_list('pk', flat=True))
+        documents = {pk: [] for pk in pks}
+        for pk, name, text in recipes.values_list('pk', 'name', 'text'):
+            documents[pk].extend(((name, 'A'), (text, 'C')))
+        for pk, name in Recipe.tags.through.objects.filter(
+                recipe__in=pks).values_list('recipe', 'tag__name'):
+            documents[pk].append((name, 'B'))
+        for pk, name in RecipeIngredient.objects.filter(
+                recipes__in=pks).values_list('recipes', 'ingredients__name'):
+            documents[pk].append((name, 'B'))
+        for pk, fields in documents.items():
+            self._remove(pk)
+            scores = defaultdict(float)
+            for text, weight in fields:
+                for term in terms(text):
+                    scores[term] += RECIPE_SEARCH_WEIGHTS[weight]
+            self._documents[pk] = tuple(scores)
+            for term, score in scores.items():
+                self._postings[term][pk] = score
+
+    def _remove(self, pk):
+        for term in self._documents.pop(pk, ()):
+            postings = self._postings[term]
+            postings.pop(pk, None)
+            if not postings:
+                del self._postings[term]
+
+    def sync(self):
+        version = changes.get_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            pks = changes.changed_since(self._version, version)
+            if pks is None:
+                self._documents.clear()
+                self._postings.clear()
+                self._load(Recipe.objects.all())
+            else:
+                for pk in pks:
+                    self._remove(pk)
+                self._load(Recipe.objects.filter(pk__in=pks))
+            self._version = version
+
+    def search(self, query):
+        query_terms = set(terms(query))
+        if not query_terms:
+            return {}
+        with self._lock:
+            self.sync()
+            postings = sorted((self._postings.get(term, {})
+                               for term in query_terms), key=len)
+            matches = set(postings[0]).intersection(*postings[1:])
+            return {pk: sum(math.log1p(posting[pk]) for posting in postings)
+                    for pk in matches}
+
+
+fallback_index = RecipeSearchIndex()
+
+
+def search(queryset, query):
+    if is_postgresql(queryset.db):
+        search_query = SearchQuery(query, config=RECIPE_SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-created_at', '-id')
+    ranks = fallback_index.search(query)
+    return queryset.filter(pk__in=ranks).annotate(
+        search_rank=Case(*(When(pk=pk, then=Value(rank))
+                           for pk, rank in ranks.items()),
+                         default=Value(0.0), output_field=FloatField())
+    ).order_by('-search_rank', '-created_at', '-id')
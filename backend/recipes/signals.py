@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from foodgram_backend.counters import shift_counter
+from foodgram_backend.images import schedule_variants, variants_ready
+from users.models import Subscribe
+from . import changes
+from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCartItem, ShoppingList, Tag, TimelineEntry)
+from .search import schedule_reindex
+
+User = get_user_model()
+
+AUTHOR_FIELDS = frozenset(('username', 'first_name', 'last_name', 'email',
+                           'avatar', ))
+RECIPE_RELATIONS = {Recipe.tags.through: 'tags',
+                    Recipe.ingredients.through: 'ingredients'}
+
+
+def recipes_changed(recipes):
+    recipes.touch()
+    pks = set(recipes.values_list('pk', flat=True))
+    schedule_reindex(pks)
+    changes.record(pks)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    recipes_changed(Recipe.objects.filter(pk=instance.recipes_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            recipes_changed(Recipe.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        recipes_changed(Recipe.objects.filter(
+            **{RECIPE_RELATIONS[sender]: instance}))
+    elif action in ('post_add', 'post_remove'):
+        recipes_changed(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    recipes_changed(Recipe.objects.filter(tags=instance))
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    recipes_changed(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields is not None
+                   and AUTHOR_FIELDS.isdisjoint(update_fields)):
+        return
+    instance.recipes.touch()
+
+
+@receiver(post_save, sender=ShoppingList)
+def shopping_list_added(sender, instance, created, **kwargs):
+    if created:
+        ShoppingCartItem.objects.add_recipe(instance.user_id,
+                                            instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingList)
+def shopping_list_removed(sender, instance, **kwargs):
+    ShoppingCartItem.objects.remove_recipe(instance.user_id,
+                                           instance.recipe_id)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                      'favorites_count', 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorite_removed(sender, instance, **kwargs):
+    shift_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                  'favorites_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_added(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(User.objects.filter(pk=instance.author_id),
+                      'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        TimelineEntry.objects.fan_out(instance)
+
+
+@receiver(post_save, sender=Subscribe)
+def timeline_subscribed(sender, instance, created, **kwargs):
+    if created:
+        TimelineEntry.objects.backfill(instance.subscriber_id,
+                                       instance.user_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def timeline_unsubscribed(sender, instance, **kwargs):
+    TimelineEntry.objects.prune(instance.subscriber_id, instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    shift_counter(User.objects.filter(pk=instance.author_id),
+                  'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_document_saved(sender, instance, **kwargs):
+    schedule_reindex((instance.pk, ))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changes_recorded(sender, instance, **kwargs):
+    changes.record((instance.pk, ))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    schedule_variants(instance, 'image')
+
+
+@receiver(variants_ready, sender=Recipe)
+def recipe_variants_ready(sender, pk, **kwargs):
+    Recipe.objects.filter(pk=pk).touch()
+
+
+@receiver(variants_ready, sender=User)
+def avatar_variants_ready(sender, pk, **kwargs):
+    Recipe.objects.filter(author=pk).touch()
@@ -0,0 +1,74 @@
+import numpy as np
+from scipy import sparse
+
+_matrix = None
+_transposed = None
+
+
+def feature_matrix(rows, columns, n_rows, column_weights,
+                   max_share=None):
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(n_rows, len(column_weights)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    weights = np.log((1 + n_rows) / (1 + frequency)) + 1
+    weights *= column_weights
+    if max_share is not None:
+        weights[frequency > max_share * n_rows] = 0
+    matrix = matrix @ sparse.diags(weights.astype(np.float32))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags((1 / norms).astype(np.float32)) @ matrix
+    matrix.eliminate_zeros()
+    return matrix.tocsr()
+
+
+def _init(matrix):
+    global _matrix, _transposed
+    _matrix = matrix
+    _transposed = matrix.T.tocsr()
+
+
+def _top_k(sources, k):
+    product = _matrix[sources] @ _transposed
+    rows, columns, scores = [], [], []
+    for row, source in enumerate(sources):
+        start, end = product.indptr[row:row + 2]
+        column = product.indices[start:end]
+        score = product.data[start:end]
+        keep = (column != source) & (score > 0)
+        column, score = column[keep], score[keep]
+        if len(score) > k:
+            keep = score >= np.partition(score, len(score) - k)[-k]
+            column, score = column[keep], score[keep]
+        order = np.lexsort((column, -score))[:k]
+        rows.append(np.full(len(order), source))
+        columns.append(column[order])
+        scores.append(score[order])
+    ranks = [np.arange(len(row)) for row in rows]
+    return (sources, *map(np.concatenate, (rows, columns, scores, ranks)))
+
+
+def nearest(matrix, sources, k, batch_size, workers=1):
+    batches = [sources[start:start + batch_size]
+               for start in range(0, len(sources), batch_size)]
+    if workers <= 1:
+        _init(matrix)
+        for batch in batches:
+            yield _top_k(batch, k)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init,
+                             initargs=(matrix, )) as executor:
+        yield from executor.map(_top_k, batches, [k] * len(batches))
+
+
+def best_scores(matrix, sources):
+    if not len(sources):
+        return np.zeros(matrix.shape[0], dtype=np.float32)
+    product = matrix @ matrix[sources].T
+    best = product.max(axis=1).toarray().ravel()
+    best[sources] = np.inf
+    return best
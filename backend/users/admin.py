@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 
+from foodgram_backend.paginators import EstimatedCountPaginator
 from .models import Subscribe
 
 User = get_user_model()
@@ -13,18 +14,16 @@ class UserAdmin(DjangoUserAdmin):
                     'last_name', 'is_active', 'recipes_count',
                     'subscribers_count', )
     search_fields = ('username', 'email', )
-
-    @admin.display(description='Количество рецептов')
-    def recipes_count(self, user):
-        return user.recipes.count()
-
-    @admin.display(description='Количество подписчиков')
-    def subscribers_count(self, user):
-        return user.following.count()
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Subscribe)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('subscriber', 'user')
+    list_select_related = ('subscriber', 'user', )
+    autocomplete_fields = ('subscriber', 'user', )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('subscriber__username', 'subscriber__email',
                      'user__username', 'user__email')
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:42
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def count_recipes_and_subscribers(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscribe = apps.get_model('users', 'Subscribe')
+    User.objects.update(recipes_count=count_related(Recipe, 'author'),
+                        subscribers_count=count_related(Subscribe, 'user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0007_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.RunPython(count_recipes_and_subscribers,
+                             migrations.RunPython.noop),
+    ]
@@ -15,6 +15,16 @@ class User(AbstractUser):
     avatar = models.ImageField('Аватар',
                                upload_to='users/',
                                null=True)
+    avatar_variants = models.JSONField('Варианты аватара',
+                                       default=dict,
+                                       blank=True,
+                                       editable=False)
+    recipes_count = models.PositiveIntegerField('Количество рецептов',
+                                                default=0,
+                                                editable=False)
+    subscribers_count = models.PositiveIntegerField('Количество подписчиков',
+                                                    default=0,
+                                                    editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -26,6 +36,12 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using, fields)
+
 
 class Subscribe(models.Model):
     subscriber = models.ForeignKey(User,
@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram_backend.constants import FEED_FANOUT_LIMIT
+from foodgram_backend.counters import shift_counter
+from foodgram_backend.images import schedule_variants
+from recipes.models import TimelineEntry
+from .models import Subscribe, User
+
+
+@receiver(post_save, sender=Subscribe)
+def subscription_added(sender, instance, created, **kwargs):
+    if not created:
+        return
+    authors = User.objects.filter(pk=instance.user_id)
+    with transaction.atomic():
+        shift_counter(authors, 'subscribers_count', 1)
+        if authors.filter(subscribers_count=FEED_FANOUT_LIMIT + 1).exists():
+            TimelineEntry.objects.prune_author(instance.user_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscription_removed(sender, instance, **kwargs):
+    authors = User.objects.filter(pk=instance.user_id)
+    with transaction.atomic():
+        shift_counter(authors, 'subscribers_count', -1)
+        if authors.filter(subscribers_count=FEED_FANOUT_LIMIT).exists():
+            TimelineEntry.objects.backfill_author(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def avatar_saved(sender, instance, **kwargs):
+    schedule_variants(instance, 'avatar')